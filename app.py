@@ -1,127 +1,107 @@
+import time
+_rerun_started_at = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 import math
-import streamlit_shadcn_ui as ui
+import os
 
 # --- 1. 定数設定 ---
-LOSS_RATE = 0.20  # 焙煎による重量目減り率 20%
+# LOSS_RATE / TAX_RATE / DEFAULT_PLATFORM_FEE_RATE live in the pricing engine
 # SALES_UNIT_G is now dynamic
-TAX_RATE = 0.08   # 消費税率 8% (軽減税率)
-DEFAULT_PLATFORM_FEE_RATE = 0.10 # プラットフォーム手数料 10%
+from pricing import DEFAULT_PLATFORM_FEE_RATE, LOSS_RATE, RESULT_COLUMNS, active_mask, summarize
+from pricing.cache import ResultsCache
+from pricing.columnar import LotColumns, ResultColumns, price_columns
+from pricing.snapshot import load_or_compute, snapshot_key
+from pricing.fees import compare_channels
+from pricing.montecarlo import simulate
+from pricing.inventory import project
+from pricing.inverse import SOLVE_RATE, SOLVE_SALES_UNIT, TARGET_BREAKEVEN, TARGET_PROFIT, TARGET_ROI, solve_targets
+from pricing.views import DEFAULT_RESULTS_PAGE_SIZE, NUMERIC_COLUMNS, cards_html, select_page, table_frame
+from pricing.optimizer import OBJECTIVE_DISCOUNT, OBJECTIVE_PROFIT, optimize_discounts
+from pricing.discount import (
+    STATUS_DANGER, STATUS_SAFE, STATUS_WARNING, bag_metrics, bag_status, discount_curve, wholesale_reference_profit
+)
+from pricing.store import DEFAULT_DB_PATH, DEFAULT_PAGE_SIZE, LotStore
+from pricing.timing import PROFILE_ENABLED, RerunProfile, latency_summary, lazy_import, profile_summary, record_rerun
+
+STYLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "style.css")
+
+STATUS_BADGES = {
+    STATUS_DANGER: '<span class="status-badge status-danger">🔴 赤字 (Danger)</span>',
+    STATUS_SAFE: '<span class="status-badge status-safe">🟢 安全圏 (Safe)</span>',
+    STATUS_WARNING: '<span class="status-badge status-warning">🟡 注意 (Warning)</span>',
+}
+
+@st.cache_resource
+def inline_styles():
+    with open(STYLE_PATH, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+def emit_styles():
+    # With static serving the browser caches the stylesheet and each rerun only
+    # ships a one-line <link>; otherwise fall back to the inline <style> block.
+    if st.get_option("server.enableStaticServing"):
+        st.markdown('<link rel="stylesheet" href="app/static/style.css">', unsafe_allow_html=True)
+    else:
+        st.markdown(inline_styles(), unsafe_allow_html=True)
+
+@st.cache_resource(max_entries=128)
+def build_discount_chart(retail_price, cost_per_bag, sales_unit_g, fee_rate, big_bag_g, target_wholesale_rate):
+    alt = lazy_import("altair")
+
+    df_chart = discount_curve(retail_price, cost_per_bag, sales_unit_g, fee_rate, big_bag_g)
+
+    # Reference Lines
+    # Wholesale Profit Line (Profit if sold at wholesale rate logic)
+    bag_cost = cost_per_bag / sales_unit_g * big_bag_g
+    wholesale_profit = float(wholesale_reference_profit(bag_cost, target_wholesale_rate, fee_rate))
+
+    base_chart = alt.Chart(df_chart).mark_line(point=True).encode(
+        x=alt.X("Discount (%):Q", scale=alt.Scale(domain=[0, 50])),
+        y=alt.Y("Profit (JPY):Q"),
+        tooltip=["Discount (%)", "Profit (JPY)"]
+    )
+
+    zero_rule = alt.Chart(pd.DataFrame({'y': [0]})).mark_rule(color='red', strokeDash=[3,3]).encode(y='y')
+    wholesale_rule = alt.Chart(pd.DataFrame({'y': [wholesale_profit]})).mark_rule(color='orange', strokeDash=[5,5]).encode(
+        y='y', 
+        tooltip=alt.value(f"Wholesale Profit Line: {int(wholesale_profit)} JPY")
+    )
+
+    lbl_zero = zero_rule.mark_text(align='left', dx=5, dy=-5, text='損益分岐点').encode()
+    lbl_whole = wholesale_rule.mark_text(align='left', dx=5, dy=-5, text='卸売水準').encode()
+
+    return (base_chart + zero_rule + wholesale_rule + lbl_zero + lbl_whole).interactive()
+
+@st.cache_resource(max_entries=4)
+def price_catalog(_store, catalog_version, sales_unit_g, fee_rate):
+    # Whole-catalog results, recomputed only when the store or the parameters change.
+    # Kept as compact typed columns (no per-lot dicts) and shared by all sessions;
+    # the on-disk snapshot is memory-mapped, so other processes share it as well.
+    def compute():
+        return ResultColumns.concat(
+            price_columns(LotColumns.from_frame(frame), sales_unit_g, fee_rate, LOSS_RATE)
+            for frame in _store.iter_frames()
+        )
+
+    key = snapshot_key(catalog_version, sales_unit_g, fee_rate, LOSS_RATE)
+    return load_or_compute(key, compute, ResultColumns)
+
+@st.cache_resource
+def get_lot_store():
+    # One SQLite connection shared by all sessions (the store serializes access)
+    return LotStore(DEFAULT_DB_PATH)
 
 def main():
     st.set_page_config(page_title="自家焙煎コーヒー豆 収益シミュレーター", layout="wide", page_icon="☕")
 
+    # Opt-in per-stage timing (COFFEE_PROFILE=1 or the toggle in the debug panel)
+    profile = RerunProfile(_rerun_started_at, enabled=PROFILE_ENABLED or st.session_state.get("profile_enabled", False))
+    profile.lap("setup")
+
     # --- Custom CSS for Shadcn/Modern Look ---
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-        
-        html, body, [class*="css"]  {
-            font-family: 'Inter', sans-serif;
-        }
-        
-        /* Clean white background */
-        .stApp {
-            background-color: #ffffff;
-            color: #0f172a;
-        }
-
-        /* Metric Styling Adjustment */
-        .stMetric {
-            background-color: #f8fafc;
-            border: 1px solid #e2e8f0;
-            border-radius: 8px;
-            padding: 10px;
-        }
-        
-        /* Input Fields */
-        .stTextInput input, .stNumberInput input {
-            border-radius: 6px;
-            border: 1px solid #e2e8f0;
-            color: #0f172a;
-        }
-
-        /* Widget Labels - Force Dark Color */
-        .stTextInput label, .stNumberInput label, .stSlider label, .stSelectbox label {
-            color: #334155 !important;
-        }
-        
-        /* Mobile Card Styling */
-        .bean-card {
-            background-color: #ffffff;
-            border: 1px solid #e2e8f0;
-            border-radius: 8px;
-            padding: 20px;
-            margin-bottom: 20px;
-            box-shadow: 0 1px 3px 0 rgba(0, 0, 0, 0.1), 0 1px 2px 0 rgba(0, 0, 0, 0.06);
-        }
-        
-        .bean-card-header {
-            font-size: 1.125rem;
-            font-weight: 600;
-            color: #0f172a;
-            margin-bottom: 12px;
-            display: flex;
-            align-items: center;
-        }
-        
-        .price-tag {
-            background-color: #e0f2fe; 
-            color: #0369a1;
-            padding: 12px;
-            border-radius: 6px;
-            text-align: center;
-            margin: 10px 0;
-            border: 1px solid #bae6fd;
-        }
-        
-        .price-label {
-            font-size: 0.75rem;
-            text-transform: uppercase;
-            letter-spacing: 0.05em;
-            color: #0284c7;
-        }
-        
-        .price-value {
-            font-size: 1.5rem;
-            font-weight: 700;
-        }
-        
-        .divider {
-            height: 1px;
-            background-color: #e2e8f0;
-            margin: 16px 0;
-        }
-        
-        .grid-info {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 12px;
-            font-size: 0.875rem;
-        }
-        
-        .info-item-label {
-            color: #64748b;
-        }
-        .info-item-value {
-            font-weight: 500;
-            color: #334155;
-        }
-
-        /* Status Badges */
-        .status-badge {
-            display: inline-block;
-            padding: 4px 12px;
-            border-radius: 999px;
-            font-size: 0.85rem;
-            font-weight: 600;
-        }
-        .status-safe { background-color: #dcfce7; color: #166534; }
-        .status-warning { background-color: #fef9c3; color: #854d0e; }
-        .status-danger { background-color: #fee2e2; color: #991b1b; }
-        </style>
-    """, unsafe_allow_html=True)
+    emit_styles()
 
     # --- Sidebar Settings ---
     st.sidebar.title("⚙️ 設定")
@@ -152,17 +132,53 @@ def main():
         """)
 
     # --- Initialize Persistent Store ---
-    if 'bean_store' not in st.session_state:
-        st.session_state['bean_store'] = [
-            {
-                "name": "",
-                "purchase_price": 0,
-                "purchase_weight_kg": 0.0,
-                "target_rate_retail": 30,
-                "target_rate_wholesale": 50
-            }
-            for _ in range(5)
-        ]
+    store = get_lot_store()
+
+    st.sidebar.write("### 🗂 豆カタログ")
+    new_lot_id = st.session_state.pop("new_lot_id", None)
+    if new_lot_id is not None:
+        # Show the lot just added: clear the filters and jump to its page (set before the widgets exist)
+        st.session_state["catalog_query"] = ""
+        st.session_state["catalog_origin"] = "すべて"
+        st.session_state["catalog_page"] = store.position(new_lot_id) // DEFAULT_PAGE_SIZE + 1
+        st.session_state["focus_lot_id"] = new_lot_id
+    search_query = st.sidebar.text_input("名称で検索 (前方一致)", key="catalog_query")
+    origin_options = ["すべて"] + store.origins()
+    selected_origin = st.sidebar.selectbox("産地", origin_options, key="catalog_origin")
+    origin_filter = None if selected_origin == "すべて" else selected_origin
+
+    lot_count = store.count(search_query, origin_filter)
+    if lot_count == 0 and not search_query and origin_filter is None:
+        # Empty catalog: start with one blank lot so the form is always available
+        store.add()
+        lot_count = 1
+
+    page_count = max(1, math.ceil(lot_count / DEFAULT_PAGE_SIZE))
+    page_no = st.sidebar.number_input("ページ", min_value=1, max_value=page_count, step=1, key="catalog_page")
+    if lot_count:
+        st.sidebar.caption(f"{lot_count:,} 件中 {(page_no - 1) * DEFAULT_PAGE_SIZE + 1:,}〜{min(page_no * DEFAULT_PAGE_SIZE, lot_count):,} 件を表示")
+
+    if st.sidebar.button("➕ 新しい豆を追加"):
+        st.session_state["new_lot_id"] = store.add()
+        st.rerun()
+
+    with st.sidebar.expander("📥 CSV インポート"):
+        uploaded = st.file_uploader("name, origin, purchase_price, purchase_weight_kg, target_rate_retail, target_rate_wholesale", type="csv")
+        if uploaded is not None and st.button("インポート"):
+            imported = skipped = 0
+            for chunk in pd.read_csv(uploaded, keep_default_na=False, chunksize=100_000):
+                added, bad = store.add_many(chunk)
+                imported += added
+                skipped += bad
+            note = f" (数値が空欄・不正な {skipped:,} 件はスキップしました)" if skipped else ""
+            st.success(f"{imported:,} 件を追加しました。{note}")
+
+    # Only the lots on the current page are loaded and priced. The form pages in
+    # insertion order so a lot stays on its tab while it is renamed; search results by name.
+    st.session_state['bean_store'] = store.page(
+        page_no - 1, DEFAULT_PAGE_SIZE, search_query, origin_filter, order="name" if search_query else "id"
+    )
+    page_offset = (page_no - 1) * DEFAULT_PAGE_SIZE
 
     # --- 2. Input Area (Styled) ---
     st.write("### 📝 豆情報の入力")
@@ -171,122 +187,139 @@ def main():
     use_platform_fee = st.toggle("プラットフォーム手数料 (10%) を適用する", value=True)
     current_fee_rate = DEFAULT_PLATFORM_FEE_RATE if use_platform_fee else 0.0
     
-    # Tabs for beans
-    tabs = ui.tabs(options=["豆 1", "豆 2", "豆 3", "豆 4", "豆 5"], default_value="豆 1", key="bean_tabs")
-    current_idx = int(tabs.split(" ")[1]) - 1
-
-    # Access current bean data from store
-    current_bean_data = st.session_state['bean_store'][current_idx]
-
-    with st.container():
-        st.caption(f"豆 No.{current_idx + 1} の設定")
-        c1, c2, c3 = st.columns([2, 1, 1])
-        with c1:
-            new_name = st.text_input(
-                f"豆の名称", 
-                value=current_bean_data["name"], 
-                key=f"name_{current_idx}", 
-                placeholder="例: エチオピア イルガチェフェ"
-            )
-            st.session_state['bean_store'][current_idx]["name"] = new_name
-
-        with c2:
-            new_price = st.number_input(
-                f"仕入れ価格 (税込) [円]", 
-                min_value=0, 
-                step=100, 
-                value=current_bean_data["purchase_price"],
-                key=f"price_{current_idx}"
-            )
-            st.session_state['bean_store'][current_idx]["purchase_price"] = new_price
-
-        with c3:
-            new_weight = st.number_input(
-                f"仕入れ重量 [kg]", 
-                min_value=0.0, 
-                step=0.1, 
-                format="%.2f", 
-                value=current_bean_data["purchase_weight_kg"],
-                key=f"weight_{current_idx}"
-            )
-            st.session_state['bean_store'][current_idx]["purchase_weight_kg"] = new_weight
-        
-        c4, c5 = st.columns(2)
-        with c4:
-            new_rr = st.slider(
-                f"目標原価率 (小売) [%]", 
-                10, 80, 
-                value=current_bean_data["target_rate_retail"], 
-                key=f"rate_retail_{current_idx}"
-            )
-            st.session_state['bean_store'][current_idx]["target_rate_retail"] = new_rr
-
-        with c5:
-            new_rw = st.slider(
-                f"目標原価率 (卸売) [%]", 
-                10, 80, 
-                value=current_bean_data["target_rate_wholesale"], 
-                key=f"rate_wholesale_{current_idx}"
-            )
-            st.session_state['bean_store'][current_idx]["target_rate_wholesale"] = new_rw
+    # Deferred until the first widget that needs it, so the header renders first on a cold start
+    ui = lazy_import("streamlit_shadcn_ui")
+
+    if not st.session_state['bean_store']:
+        st.info("条件に一致する豆がありません。")
+    else:
+        # Tabs for beans on this page
+        tab_options = [f"豆 {page_offset + i + 1}" for i in range(len(st.session_state['bean_store']))]
+        page_ids = [lot["id"] for lot in st.session_state['bean_store']]
+        focus_lot_id = st.session_state.get("focus_lot_id")
+        default_tab = tab_options[page_ids.index(focus_lot_id)] if focus_lot_id in page_ids else tab_options[0]
+        tabs = ui.tabs(options=tab_options, default_value=default_tab, key=f"bean_tabs_{page_no}_{focus_lot_id}")
+        current_idx = tab_options.index(tabs) if tabs in tab_options else 0
+
+        # Access current bean data from store
+        current_bean_data = st.session_state['bean_store'][current_idx]
+        lot_id = current_bean_data["id"]
+        changes = {}
+
+        with st.container():
+            st.caption(f"豆 No.{page_offset + current_idx + 1} の設定")
+            c1, c_origin, c2, c3 = st.columns([2, 1, 1, 1])
+            with c1:
+                changes["name"] = st.text_input(
+                    f"豆の名称", 
+                    value=current_bean_data["name"], 
+                    key=f"name_{lot_id}", 
+                    placeholder="例: エチオピア イルガチェフェ"
+                )
+
+            with c_origin:
+                changes["origin"] = st.text_input(
+                    f"産地", 
+                    value=current_bean_data["origin"], 
+                    key=f"origin_{lot_id}", 
+                    placeholder="例: エチオピア"
+                )
+
+            with c2:
+                changes["purchase_price"] = st.number_input(
+                    f"仕入れ価格 (税込) [円]", 
+                    min_value=0, 
+                    step=100, 
+                    value=current_bean_data["purchase_price"],
+                    key=f"price_{lot_id}"
+                )
+
+            with c3:
+                changes["purchase_weight_kg"] = st.number_input(
+                    f"仕入れ重量 [kg]", 
+                    min_value=0.0, 
+                    step=0.1, 
+                    format="%.2f", 
+                    value=current_bean_data["purchase_weight_kg"],
+                    key=f"weight_{lot_id}"
+                )
+            
+            c4, c5 = st.columns(2)
+            with c4:
+                changes["target_rate_retail"] = st.slider(
+                    f"目標原価率 (小売) [%]", 
+                    10, 80, 
+                    value=current_bean_data["target_rate_retail"], 
+                    key=f"rate_retail_{lot_id}"
+                )
+
+            with c5:
+                changes["target_rate_wholesale"] = st.slider(
+                    f"目標原価率 (卸売) [%]", 
+                    10, 80, 
+                    value=current_bean_data["target_rate_wholesale"], 
+                    key=f"rate_wholesale_{lot_id}"
+                )
+
+            # Persist only the fields that actually changed
+            changes = {k: v for k, v in changes.items() if current_bean_data[k] != v}
+            if changes:
+                store.update(lot_id, **changes)
+                current_bean_data.update(changes)
+
+            if st.button("🗑 この豆を削除", key=f"delete_{lot_id}"):
+                store.delete(lot_id)
+                st.rerun()
+
+    profile.lap("input")
 
     # --- 3. Calculation Logic ---
-    results = []
-    total_purchase = 0
-    total_profit = 0
-    
-    active_beans = []
-    for i, bean_data in enumerate(st.session_state['bean_store']):
-        if bean_data["name"] and bean_data["purchase_price"] > 0 and bean_data["purchase_weight_kg"] > 0:
-             active_beans.append(bean_data)
+    bean_store = st.session_state['bean_store']
 
-    if not active_beans:
+    if not active_mask(bean_store).any():
         st.info("👆 上記のフォームに豆の情報を入力してください。")
-    
-    for bean in active_beans:
-        roasted_weight_g = bean["purchase_weight_kg"] * 1000 * (1 - LOSS_RATE)
-        # Use Dynamic Sales Unit
-        sellable_units = math.floor(roasted_weight_g / sales_unit_g)
-        if sellable_units <= 0: continue
-        
-        cost_per_bag = bean["purchase_price"] / sellable_units
-        
-        # Retail Price
-        price_retail_raw = cost_per_bag / (bean["target_rate_retail"] / 100)
-        price_retail = math.ceil(price_retail_raw / 10) * 10
-        
-        # Wholesale Price
-        price_wholesale_raw = cost_per_bag / (bean["target_rate_wholesale"] / 100)
-        price_wholesale = math.ceil(price_wholesale_raw / 10) * 10
-        
-        # Breakeven Units
-        revenue_per_bag = price_retail * (1 - current_fee_rate)
-        if revenue_per_bag > 0:
-            breakeven_units = math.ceil(bean["purchase_price"] / revenue_per_bag)
-        else:
-            breakeven_units = 999999 
 
-        expected_profit = (price_retail * sellable_units * (1 - current_fee_rate)) - bean["purchase_price"]
-        
+    # Only lots whose inputs (or the global parameters) changed are repriced
+    if 'results_cache' not in st.session_state:
+        st.session_state['results_cache'] = ResultsCache()
+    results_cache = st.session_state['results_cache']
+    priced_rows = results_cache.update(bean_store, sales_unit_g, current_fee_rate, LOSS_RATE)
+    total_purchase, total_profit, roi = results_cache.total_purchase, results_cache.total_profit, results_cache.roi
+    cache_stats = results_cache.stats()
+    st.sidebar.caption(f"計算キャッシュ: hit {cache_stats['hits']:,} / miss {cache_stats['misses']:,}")
+
+    results = []
+    for bean, row in priced_rows:
         results.append({
-            "name": bean["name"],
-            "retail_price": int(price_retail),
-            "wholesale_price": int(price_wholesale),
-            "profit": int(expected_profit),
-            "cost_per_bag": int(cost_per_bag),
-            "units": int(sellable_units),
-            "breakeven_units": int(breakeven_units),
+            "name": row["name"],
+            "retail_price": int(row["retail_price"]),
+            "wholesale_price": int(row["wholesale_price"]),
+            "profit": int(row["profit"]),
+            "cost_per_bag": int(row["cost_per_bag"]),
+            "units": int(row["units"]),
+            "breakeven_units": int(row["breakeven_units"]),
             "raw_data": bean # Store raw data for advanced sim
         })
-        
-        total_purchase += bean["purchase_price"]
-        total_profit += expected_profit
+
+    profile.count("beans_processed", len(bean_store))
+    profile.count("beans_priced", len(results))
+    profile.lap("calculation")
 
     # --- 4. Results UI ---
     st.markdown("---")
     st.write("### 📊 シミュレーション結果")
     
     view_mode = ui.tabs(options=["カード表示 (Mobile)", "一覧表 (PC)"], default_value="カード表示 (Mobile)", key="view_tabs")
+    scope = st.radio("集計範囲", ["表示中のページ", "カタログ全体"], horizontal=True, key="results_scope")
+
+    if scope == "カタログ全体":
+        result_frame, catalog_source = price_catalog(store, store.catalog_version(), sales_unit_g, current_fee_rate)
+        if catalog_source == "snapshot":
+            st.caption("保存済みの計算結果 (スナップショット) を読み込みました。")
+        total_purchase, total_profit, roi = summarize(result_frame)
+        profile.count("catalog_beans_priced", len(result_frame))
+    else:
+        result_frame = pd.DataFrame([row for _, row in priced_rows], columns=RESULT_COLUMNS)
 
     # Global Metrics using Shadcn Cards
     m1, m2, m3 = st.columns(3)
@@ -295,64 +328,68 @@ def main():
     with m2:
         ui.metric_card(title="期待利益総額", content=f"{int(total_profit):,} 円", description="諸経費を引いた利益", key="card2")
     with m3:
-        roi = (total_profit / total_purchase * 100) if total_purchase > 0 else 0
         ui.metric_card(title="ROI (投資対効果)", content=f"{roi:.1f} %", description="仕入れに対する利益率", key="card3")
 
     st.write("") # Spacer
 
+    # Sort / filter run on the numeric columns; only the visible page is formatted
+    s1, s2, s3, s4 = st.columns([2, 1, 2, 2])
+    with s1:
+        sort_by = st.selectbox("並び替え", [None] + list(NUMERIC_COLUMNS), format_func=lambda c: "登録順" if c is None else NUMERIC_COLUMNS[c], key="results_sort")
+    with s2:
+        descending = st.toggle("降順", value=True, key="results_desc")
+    with s3:
+        filter_col = st.selectbox("絞り込み", [None] + list(NUMERIC_COLUMNS), format_func=lambda c: "なし" if c is None else NUMERIC_COLUMNS[c], key="results_filter_col")
+    with s4:
+        filter_min = st.number_input("下限", value=None, step=100, key="results_filter_min", disabled=filter_col is None)
+    filters = {filter_col: (filter_min, None)} if filter_col is not None and filter_min is not None else None
+
+    results_page_size = st.session_state.get("results_page_size", DEFAULT_RESULTS_PAGE_SIZE)
+    results_page_no = st.session_state.get("results_page", 1)
+    visible, matching = select_page(result_frame, sort_by, not descending, filters, results_page_no - 1, results_page_size)
+    results_page_count = max(1, math.ceil(matching / results_page_size))
+    if results_page_no > results_page_count:
+        # The filter shrank the result set: jump to its last page
+        results_page_no = st.session_state["results_page"] = results_page_count
+        visible, matching = select_page(result_frame, sort_by, not descending, filters, results_page_no - 1, results_page_size)
+
     if view_mode == "一覧表 (PC)":
-        if results:
+        if len(visible):
             st.caption(f"※現在の販売単位: {sales_unit_g}g / 袋")
-            display_data = []
-            for r in results:
-                display_data.append({
-                    "豆の名称": r["name"],
-                    "推奨売価(小売)": f"{r['retail_price']:,} 円",
-                    "推奨売価(卸売)": f"{r['wholesale_price']:,} 円",
-                    "利益": f"{r['profit']:,} 円",
-                    "原価/袋": f"{r['cost_per_bag']:,} 円",
-                    "販売数(袋)": f"{r['units']:,}",
-                    "損益分岐点(販売数)": f"{r['breakeven_units']} 袋"
-                })
-            
-            df_display = pd.DataFrame(display_data)
+            df_display = table_frame(visible)
             ui.table(data=df_display, maxHeight=400)
         else:
             st.write("データがありません。")
 
     else: # Card View
-        if not results:
+        if not len(visible):
             st.write("データがありません。")
         
         st.caption(f"※現在の販売単位: {sales_unit_g}g / 袋")
-        for r in results:
-            be_color = '#ef4444' if r['breakeven_units'] > r['units'] else '#22c55e'
-            
-            html_content = (
-                f'<div class="bean-card">'
-                f'<div class="bean-card-header"><span>☕ {r["name"]}</span></div>'
-                f'<div class="price-tag">'
-                f'<div class="price-label">推奨販売価格 (通常小売)</div>'
-                f'<div class="price-value">¥ {r["retail_price"]:,}</div>'
-                f'</div>'
-                f'<div class="grid-info">'
-                f'<div><span class="info-item-label">卸売価格</span></div>'
-                f'<div style="text-align:right"><span class="info-item-value">¥ {r["wholesale_price"]:,}</span></div>'
-                f'<div><span class="info-item-label">利益</span></div>'
-                f'<div style="text-align:right"><span class="info-item-value">¥ {r["profit"]:,}</span></div>'
-                f'<div><span class="info-item-label">原価/袋</span></div>'
-                f'<div style="text-align:right"><span class="info-item-value">¥ {r["cost_per_bag"]:,}</span></div>'
-                f'<div><span class="info-item-label">販売可能数</span></div>'
-                f'<div style="text-align:right"><span class="info-item-value">{r["units"]:,} 袋</span></div>'
-                f'</div>'
-                f'<div class="divider"></div>'
-                f'<div style="display:flex; justify-content:space-between; font-size:0.8rem; color:#64748b;">'
-                f'<span>損益分岐点 (販売数)</span>'
-                f'<span style="font-weight:600; color:{be_color}">{r["breakeven_units"]} 袋</span>'
-                f'</div>'
-                f'</div>'
-            )
-            st.markdown(html_content, unsafe_allow_html=True)
+        if len(visible):
+            st.markdown(cards_html(visible), unsafe_allow_html=True)
+
+    p1, p2, p3 = st.columns([1, 1, 2])
+    with p1:
+        st.selectbox("表示件数", [10, 20, 50, 100], index=1, key="results_page_size")
+    with p2:
+        st.number_input("結果ページ", min_value=1, max_value=results_page_count, step=1, key="results_page")
+    with p3:
+        st.caption(f"{matching:,} 件中 {len(visible):,} 件を表示")
+
+    if results:
+        with st.expander("💳 販売チャネル比較 (手数料体系別)", expanded=False):
+            st.caption("BASE / STORES / Shopify / 店頭決済の手数料体系ごとに、利益と損益分岐点を比較します。")
+            channel_metric = st.radio("指標", ["利益 (円)", "損益分岐点 (袋)"], horizontal=True, key="channel_metric")
+            # A toggle rather than a button so switching the metric keeps the table
+            if st.toggle("比較を表示", key="channel_compare"):
+                comparison = compare_channels([r["raw_data"] for r in results], sales_unit_g=sales_unit_g, loss_rate=LOSS_RATE)
+                metric = "profit" if channel_metric.startswith("利益") else "breakeven_units"
+                channel_table = comparison[metric].copy()
+                channel_table.insert(0, "豆の名称", comparison[("name", "")])
+                st.dataframe(channel_table, hide_index=True)
+
+    profile.lap("results_ui")
 
     # --- 5. Advanced Feature: Volume Discount Simulator ---
     if results:
@@ -373,52 +410,25 @@ def main():
                 
                 big_bag_g = st.slider("大袋サイズ (g)", min_value=100, max_value=1000, value=200, step=100)
                 discount_rate_percent = st.slider("割引率 (%)", 0, 50, 0, step=5)
-                discount_rate = discount_rate_percent / 100.0
 
-                # Calculations
-                base_price_per_g = target_bean["retail_price"] / sales_unit_g
-                
-                # Scaled Price (Before Discount)
-                scaled_retail_price_raw = base_price_per_g * big_bag_g
-                # Apply Discount & Round Up
-                discounted_price_raw = scaled_retail_price_raw * (1 - discount_rate)
-                final_price = math.ceil(discounted_price_raw / 10) * 10
-                
-                # Cost Calculation
-                base_cost_per_g = target_bean["cost_per_bag"] / sales_unit_g
-                bag_cost = base_cost_per_g * big_bag_g
-                
-                # Fee
-                fee = final_price * current_fee_rate
-                
-                # Profit
-                profit_per_bag = final_price - bag_cost - fee
-                profit_rate = (profit_per_bag + fee + bag_cost) # Just sales price? No, profit rate = (Sales - Cost) / Sales usually?
-                # User requirements: Safe if > Wholesale Target Rate
-                # Wholesale Target logic: 
-                #   Price = Cost / (TargetRate / 100)
-                #   => Cost / Price = TargetRate / 100
-                #   => (1 - ProfitMargin) ? No. "Cost Ratio" is Cost/Price.
+                # Calculations (same rules as the discount grid API)
+                bag = bag_metrics(
+                    target_bean["retail_price"], target_bean["cost_per_bag"], sales_unit_g,
+                    big_bag_g, discount_rate_percent, current_fee_rate
+                )
+                final_price = int(bag["final_price"])
+                bag_cost = float(bag["bag_cost"])
+                profit_per_bag = float(bag["profit"])
+
                 # Let's interpret "Target Rate" as Cost Ratio (Genkaritsu).
-                # Safe if current Cost Ratio < Wholesale Cost Ratio (meaning better margin)
-                # Or Safe if Profit Margin > (1 - Wholesale Cost Ratio)
-                
-                current_genka_rate = (bag_cost / final_price * 100) if final_price > 0 else 100
-                target_wholesale_rate = target_bean["raw_data"]["target_rate_wholesale"]
-                
-                # Status Logic
                 # Safe: Current Genka Rate <= Target Wholesale Rate (Better or Equal Margin)
                 # Warning: Current Genka Rate > Target Wholsale Rate BUT Profit > 0
                 # Danger: Profit <= 0
-                
-                status_html = ""
-                if profit_per_bag < 0:
-                    status_html = '<span class="status-badge status-danger">🔴 赤字 (Danger)</span>'
-                elif current_genka_rate <= target_wholesale_rate:
-                    status_html = '<span class="status-badge status-safe">🟢 安全圏 (Safe)</span>'
-                else:
-                    status_html = '<span class="status-badge status-warning">🟡 注意 (Warning)</span>'
+                current_genka_rate = float(bag["cost_rate"])
+                target_wholesale_rate = target_bean["raw_data"]["target_rate_wholesale"]
+                status = bag_status(profit_per_bag, current_genka_rate, target_wholesale_rate)
 
+                status_html = STATUS_BADGES[str(status)]
 
                 st.markdown(f"""
                 <div style="background-color:#f8fafc; padding:15px; border-radius:8px; border:1px solid #e2e8f0; margin-top:20px;">
@@ -433,53 +443,161 @@ def main():
                 """, unsafe_allow_html=True)
             
             with col_sim_2:
-                # Chart Generation
-                # X: Discount Rate 0-50, Y: Profit
-                chart_data = []
-                for d in range(0, 51, 5): # 0, 5, 10 ... 50
-                    rate = d / 100.0
-                    p_raw = scaled_retail_price_raw * (1 - rate)
-                    p_final = math.ceil(p_raw / 10) * 10
-                    fee_val = p_final * current_fee_rate
-                    prof = p_final - bag_cost - fee_val
-                    chart_data.append({"Discount (%)": d, "Profit (JPY)": int(prof)})
-                
-                df_chart = pd.DataFrame(chart_data)
-                
-                # Reference Lines
-                # Wholesale Profit Line (Profit if sold at wholesale rate logic)
-                # Wholesale Price for Big Bag
-                wholesale_price_raw = (bag_cost / (target_wholesale_rate / 100))
-                wholesale_price = math.ceil(wholesale_price_raw / 10) * 10
-                wholesale_profit = wholesale_price - bag_cost - (wholesale_price * current_fee_rate)
-                
                 st.write("#### 📉 割引率と利益の推移")
-                
-                # Using Altair specifically allows for reference lines easily, 
-                # but st.line_chart is simpler. User asked to "Add reference lines".
-                # st.line_chart doesn't support adding lines easily.
-                # Let's use Altair for custom lines.
-                import altair as alt
-                
-                base_chart = alt.Chart(df_chart).mark_line(point=True).encode(
-                    x=alt.X("Discount (%):Q", scale=alt.Scale(domain=[0, 50])),
-                    y=alt.Y("Profit (JPY):Q"),
-                    tooltip=["Discount (%)", "Profit (JPY)"]
-                )
-                
-                zero_rule = alt.Chart(pd.DataFrame({'y': [0]})).mark_rule(color='red', strokeDash=[3,3]).encode(y='y')
-                wholesale_rule = alt.Chart(pd.DataFrame({'y': [wholesale_profit]})).mark_rule(color='orange', strokeDash=[5,5]).encode(
-                    y='y', 
-                    tooltip=alt.value(f"Wholesale Profit Line: {int(wholesale_profit)} JPY")
-                )
 
-                lbl_zero = zero_rule.mark_text(align='left', dx=5, dy=-5, text='損益分岐点').encode()
-                lbl_whole = wholesale_rule.mark_text(align='left', dx=5, dy=-5, text='卸売水準').encode()
-
-                final_chart = (base_chart + zero_rule + wholesale_rule + lbl_zero + lbl_whole).interactive()
-                
+                # X: Discount Rate 0-50, Y: Profit (cached, so unrelated reruns reuse the chart)
+                final_chart = build_discount_chart(
+                    target_bean["retail_price"], target_bean["cost_per_bag"], sales_unit_g,
+                    current_fee_rate, big_bag_g, target_wholesale_rate
+                )
                 st.altair_chart(final_chart, use_container_width=True)
 
+        with st.expander("🔍 最適化 (安全圏で最大利益となる大袋・割引設定)", expanded=False):
+            st.caption("全ての豆について、大袋サイズ (100〜1000g) × 割引率 (0〜50%, 1%刻み) を総当たりで評価します。")
+            objective_label = st.radio("目的", ["利益最大 (ロット全体)", "割引率最大"], horizontal=True)
+            if st.button("最適化を実行"):
+                portfolio = pd.DataFrame({
+                    "retail_price": [r["retail_price"] for r in results],
+                    "cost_per_bag": [r["cost_per_bag"] for r in results],
+                    "units": [r["units"] for r in results],
+                    "target_rate_wholesale": [r["raw_data"]["target_rate_wholesale"] for r in results],
+                })
+                best = optimize_discounts(
+                    portfolio, sales_unit_g, current_fee_rate,
+                    objective=OBJECTIVE_PROFIT if objective_label.startswith("利益") else OBJECTIVE_DISCOUNT
+                )
+                st.dataframe(pd.DataFrame({
+                    "豆の名称": [r["name"] for r in results],
+                    "大袋サイズ (g)": best["best_bag_g"],
+                    "割引率 (%)": best["best_discount_percent"],
+                    "販売価格 (円)": best["final_price"],
+                    "利益/袋 (円)": best["profit_per_bag"].round(0),
+                    "原価率 (%)": best["cost_rate"].round(1),
+                    "ロット利益 (円)": best["total_profit"].round(0),
+                }), hide_index=True)
+
+        with st.expander("🎲 感度分析 (モンテカルロ)", expanded=False):
+            st.caption("焙煎ロス率・手数料率・仕入れ価格のばらつきを乱数で再現し、利益と損益分岐点の分布を推定します (売価は現在の推奨価格で固定)。")
+            mc_c1, mc_c2, mc_c3 = st.columns(3)
+            with mc_c1:
+                loss_low, loss_high = st.slider("焙煎ロス率の範囲 (%)", 5, 35, (12, 22))
+            with mc_c2:
+                price_sd = st.slider("仕入れ価格のばらつき (標準偏差 %)", 0, 30, 5)
+            with mc_c3:
+                n_scenarios = st.select_slider("シナリオ数", options=[1_000, 10_000, 100_000, 1_000_000], value=10_000)
+            if st.button("シミュレーションを実行"):
+                mc = simulate(
+                    pd.DataFrame([r["raw_data"] for r in results]),
+                    n_scenarios=n_scenarios,
+                    sales_unit_g=sales_unit_g,
+                    loss_rate=("uniform", loss_low / 100, loss_high / 100),
+                    fee_rate=current_fee_rate,
+                    price_factor=("normal", 1.0, price_sd / 100),
+                )
+                st.dataframe(pd.DataFrame({
+                    "豆の名称": [r["name"] for r in results],
+                    "利益 P5 (円)": mc["profit_p5"].round(0),
+                    "利益 P50 (円)": mc["profit_p50"].round(0),
+                    "利益 P95 (円)": mc["profit_p95"].round(0),
+                    "赤字確率 (%)": (mc["loss_probability"] * 100).round(1),
+                    "損益分岐点 P50 (袋)": mc["breakeven_p50"],
+                    "損益分岐点 P95 (袋)": mc["breakeven_p95"],
+                }), hide_index=True)
+
+        with st.expander("📦 在庫・キャッシュフロー予測 (焙煎スケジュール)", expanded=False):
+            st.caption("仕入れ代金を初日に支払い、焙煎日ごとに必要な分だけ焙煎して日々の需要に応じて販売する流れを日単位で再現します。賞味期限を過ぎた豆は廃棄、在庫切れの分は販売機会の損失になります。")
+            inv_c1, inv_c2, inv_c3 = st.columns(3)
+            with inv_c1:
+                daily_demand = st.number_input("1日の需要 (袋/日)", min_value=0.0, value=2.0, step=0.5)
+                roast_batch_kg = st.number_input("焙煎1回の生豆 (kg)", min_value=0.1, value=3.0, step=0.5)
+            with inv_c2:
+                roast_interval_days = st.number_input("焙煎間隔 (日)", min_value=1, value=7, step=1)
+                shelf_life_days = st.number_input("販売期限 (焙煎後・日)", min_value=1, value=30, step=1)
+            with inv_c3:
+                projection_weeks = st.slider("期間 (週)", 4, 104, 52)
+                projection_scenarios = st.select_slider("シナリオ数", options=[10, 100, 1_000], value=100, key="projection_scenarios")
+            if st.button("予測を実行"):
+                summary, weekly_cash = project(
+                    pd.DataFrame([r["raw_data"] for r in results]),
+                    daily_demand=daily_demand,
+                    days=projection_weeks * 7,
+                    roast_batch_kg=roast_batch_kg,
+                    roast_interval_days=roast_interval_days,
+                    shelf_life_days=shelf_life_days,
+                    n_scenarios=projection_scenarios,
+                    sales_unit_g=sales_unit_g,
+                    fee_rate=current_fee_rate,
+                )
+                names = [r["name"] for r in results]
+                st.line_chart(pd.DataFrame(weekly_cash.to_numpy().T, index=weekly_cash.columns, columns=names))
+                st.dataframe(pd.DataFrame({
+                    "豆の名称": names,
+                    "累計収支 P50 (円)": summary["cash_p50"].round(0),
+                    "累計収支 P5 (円)": summary["cash_p5"].round(0),
+                    "販売 (袋)": summary["sold_mean"].round(1),
+                    "廃棄 (袋)": summary["written_off_mean"].round(1),
+                    "欠品 (袋)": summary["lost_sales_mean"].round(1),
+                    "回収日 P50 (日目)": summary["payback_day_p50"],
+                    "残り生豆 (kg)": summary["green_left_kg_mean"].round(2),
+                }), hide_index=True)
+
+        with st.expander("🎯 逆算 (目標から原価率・販売単位を求める)", expanded=False):
+            st.caption("目標を満たす最も高い目標原価率 (小売)、または最も小さい販売単位を全ての豆について求めます。")
+            inv_c1, inv_c2, inv_c3 = st.columns(3)
+            with inv_c1:
+                inverse_target = st.selectbox(
+                    "目標",
+                    [TARGET_PROFIT, TARGET_ROI, TARGET_BREAKEVEN],
+                    format_func={TARGET_PROFIT: "期待利益 (円) 以上", TARGET_ROI: "ROI (%) 以上", TARGET_BREAKEVEN: "損益分岐点 (袋) 以下"}.get,
+                )
+            with inv_c2:
+                inverse_value = st.number_input("目標値", value={TARGET_PROFIT: 10000, TARGET_ROI: 50, TARGET_BREAKEVEN: 30}[inverse_target], step=1)
+            with inv_c3:
+                inverse_for = st.radio("求める値", [SOLVE_RATE, SOLVE_SALES_UNIT], format_func={SOLVE_RATE: "目標原価率", SOLVE_SALES_UNIT: "販売単位"}.get)
+            if st.button("逆算を実行"):
+                solved = solve_targets(
+                    pd.DataFrame([r["raw_data"] for r in results]),
+                    inverse_target, inverse_value, solve_for=inverse_for,
+                    sales_unit_g=sales_unit_g, fee_rate=current_fee_rate,
+                )
+                st.dataframe(pd.DataFrame({
+                    "豆の名称": [r["name"] for r in results],
+                    "目標原価率 (%)": solved["target_rate_retail"].to_numpy(),
+                    "販売単位 (g)": solved["sales_unit_g"].to_numpy(),
+                    "小売価格 (円)": solved["retail_price"].to_numpy(),
+                    "期待利益 (円)": solved["profit"].to_numpy(),
+                    "損益分岐点 (袋)": solved["breakeven_units"].to_numpy(),
+                }), hide_index=True)
+
+    profile.lap("simulator")
+
+    # --- 6. Latency ---
+    rerun_ms = record_rerun(_rerun_started_at)
+    profile.finish()
+    if 'first_render_ms' not in st.session_state:
+        st.session_state['first_render_ms'] = rerun_ms
+    with st.sidebar.expander("⏱ 表示速度", expanded=False):
+        latency = latency_summary()
+        if latency["cold_start_s"] is not None:
+            st.caption(f"初回実行開始〜初回描画: {latency['cold_start_s']:.2f} 秒 (目標 {latency['cold_start_budget_s']:.1f} 秒)")
+        st.caption(f"プロセス稼働時間: {latency['process_uptime_s']:,.0f} 秒")
+        st.caption(f"このセッションの初回描画: {st.session_state['first_render_ms']:,.0f} ms")
+        st.caption(f"直近の再描画: {rerun_ms:,.0f} ms / 中央値 {latency['p50_rerun_ms']:,.0f} ms / p95 {latency['p95_rerun_ms']:,.0f} ms (目標 {latency['rerun_budget_ms']:,.0f} ms)")
+        for name, seconds in latency["imports_s"].items():
+            st.caption(f"import {name}: {seconds * 1000:,.0f} ms")
+
+    with st.sidebar.expander("🛠 計測 (デバッグ)", expanded=False):
+        st.toggle("処理段階ごとの計測を有効にする", key="profile_enabled", disabled=PROFILE_ENABLED)
+        summary = profile_summary()
+        if summary["stages"]:
+            st.dataframe(pd.DataFrame([
+                {"段階": stage, "直近 (ms)": round(t["last_ms"], 1), "中央値 (ms)": round(t["p50_ms"], 1), "p95 (ms)": round(t["p95_ms"], 1)}
+                for stage, t in summary["stages"].items()
+            ]), hide_index=True)
+            st.caption(" / ".join(f"{name}: {n:,}" for name, n in summary["counters"].items()))
+        else:
+            st.caption("計測データはまだありません。")
+
 
 if __name__ == "__main__":
     main()
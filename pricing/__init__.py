@@ -0,0 +1,26 @@
+"""Pricing engine for the coffee bean profit simulator (app.py)."""
+
+from .engine import (
+    BREAKEVEN_SENTINEL,
+    DEFAULT_PLATFORM_FEE_RATE,
+    DEFAULT_SALES_UNIT_G,
+    LOSS_RATE,
+    LOT_COLUMNS,
+    RESULT_COLUMNS,
+    TAX_RATE,
+    active_mask,
+    ceil_to_10_yen,
+    price_arrays,
+    price_lots,
+    summarize,
+    to_lot_frame,
+)
+from .cache import ResultsCache
+from .discount import bag_metrics, bag_status, discount_curve, discount_grid, wholesale_reference_profit
+from .optimizer import optimize_discounts
+from .montecarlo import simulate
+from .inventory import project
+from .views import card_html, cards_html, select_page, table_frame
+from .fees import DEFAULT_FEE_SCHEDULES, compare_channels, price_channel_arrays
+from .inverse import solve_targets
+from .columnar import LotColumns, ResultColumns, price_columns
@@ -0,0 +1,215 @@
+"""
+Headless batch pricing for a whole green-coffee catalog.
+
+    python -m pricing.batch lots.csv -o priced.csv
+    python -m pricing.batch lots.parquet -o priced.parquet --sales-unit-g 200 --no-fee
+
+The input is streamed in chunks so memory stays bounded regardless of the
+file size. Parquet support needs `pyarrow` (pip install pyarrow).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from .compat import require_pyarrow
+from .engine import (
+    DEFAULT_PLATFORM_FEE_RATE,
+    DEFAULT_SALES_UNIT_G,
+    LOSS_RATE,
+    LOT_COLUMNS,
+    RESULT_COLUMNS,
+    price_lots,
+    summarize,
+)
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+LOT_DTYPES = {"name": str}  # numeric columns are coerced per chunk, see _coerce_numeric
+NUMERIC_LOT_COLUMNS = LOT_COLUMNS[1:]
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def _coerce_numeric(lots):
+    """
+    Blank or malformed numeric cells become NaN (the lot is then inactive,
+    as in the app) instead of failing the whole file.
+    """
+    for col in NUMERIC_LOT_COLUMNS:
+        lots[col] = pd.to_numeric(lots[col], errors="coerce")
+    return lots
+
+
+def iter_lot_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, extra_columns=()):
+    """
+    Yields DataFrames of at most `chunk_size` lots from a CSV or Parquet file.
+    `extra_columns` (e.g. a per-lot `loss_rate`) are read as well when the
+    file has them; CSV values come back as read, without a fixed dtype.
+    """
+    wanted = set(LOT_COLUMNS) | set(extra_columns)
+    if _is_parquet(path):
+        require_pyarrow("Parquet の読み書き", "parquet")
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        columns = LOT_COLUMNS + [c for c in extra_columns if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield _coerce_numeric(batch.to_pandas())
+    else:
+        for chunk in pd.read_csv(
+            path,
+            usecols=lambda col: col in wanted,
+            dtype=LOT_DTYPES,
+            keep_default_na=False,
+            chunksize=chunk_size,
+        ):
+            yield _coerce_numeric(chunk)
+
+
+class ResultWriter:
+    """Appends priced chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self._writer = None
+        self._header_written = False
+
+    def write(self, results):
+        results = results[RESULT_COLUMNS]
+        if self.parquet:
+            pa = require_pyarrow("Parquet の読み書き", "parquet")
+            import pyarrow.parquet as pq
+
+            schema = pa.schema(
+                [("name", pa.string())] + [(col, pa.int64()) for col in RESULT_COLUMNS[1:]]
+            )
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, schema)
+            table = pa.Table.from_pandas(results, schema=schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            results.to_csv(
+                self.path,
+                mode="a" if self._header_written else "w",
+                header=not self._header_written,
+                index=False,
+            )
+            self._header_written = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        elif self.parquet:
+            # Nothing was priced: still leave a valid (empty) file behind
+            self.write(pd.DataFrame(columns=RESULT_COLUMNS))
+            self._writer.close()
+        elif not self._header_written:
+            self.write(pd.DataFrame(columns=RESULT_COLUMNS))
+
+
+def price_file(
+    input_path,
+    output_path,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    loss_rate=LOSS_RATE,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    progress=None,
+):
+    """
+    Streams `input_path` through the pricing rules into `output_path`.
+
+    Returns a stats dict with row counts, totals and throughput. `progress`
+    is called with the running stats after every chunk.
+    """
+    stats = {
+        "rows_in": 0,
+        "rows_out": 0,
+        "total_purchase": 0,
+        "total_profit": 0.0,
+        "seconds": 0.0,
+        "rows_per_sec": 0.0,
+    }
+    start = time.perf_counter()
+    writer = ResultWriter(output_path)
+    try:
+        for lots in iter_lot_chunks(input_path, chunk_size):
+            results = price_lots(lots, sales_unit_g, fee_rate, loss_rate)
+            writer.write(results)
+
+            chunk_purchase, chunk_profit, _ = summarize(results)
+            stats["rows_in"] += len(lots)
+            stats["rows_out"] += len(results)
+            stats["total_purchase"] += chunk_purchase
+            stats["total_profit"] += chunk_profit
+            stats["seconds"] = time.perf_counter() - start
+            stats["rows_per_sec"] = stats["rows_in"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+            if progress:
+                progress(stats)
+    finally:
+        writer.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_sec"] = stats["rows_in"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    return stats
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m pricing.batch",
+        description="生豆カタログ (CSV/Parquet) を一括で価格計算します。",
+    )
+    parser.add_argument("input", help="入力ファイル (.csv / .parquet)")
+    parser.add_argument("-o", "--output", required=True, help="出力ファイル (.csv / .parquet)")
+    parser.add_argument("--sales-unit-g", type=int, default=DEFAULT_SALES_UNIT_G, help="基本販売単位 (g)")
+    parser.add_argument("--fee-rate", type=float, default=DEFAULT_PLATFORM_FEE_RATE, help="プラットフォーム手数料率 (0.10 = 10%%)")
+    parser.add_argument("--no-fee", action="store_true", help="プラットフォーム手数料を適用しない")
+    parser.add_argument("--loss-rate", type=float, default=LOSS_RATE, help="焙煎ロス率 (0.20 = 20%%)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="1回に処理する行数")
+    parser.add_argument("-q", "--quiet", action="store_true", help="進捗を表示しない")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    fee_rate = 0.0 if args.no_fee else args.fee_rate
+
+    def report(stats):
+        print(
+            f"\r{stats['rows_in']:,} rows  {stats['rows_per_sec']:,.0f} rows/sec",
+            end="",
+            file=sys.stderr,
+        )
+
+    stats = price_file(
+        args.input,
+        args.output,
+        sales_unit_g=args.sales_unit_g,
+        fee_rate=fee_rate,
+        loss_rate=args.loss_rate,
+        chunk_size=args.chunk_size,
+        progress=None if args.quiet else report,
+    )
+
+    total_purchase = stats["total_purchase"]
+    roi = (stats["total_profit"] / total_purchase * 100) if total_purchase > 0 else 0
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(
+        f"{stats['rows_in']:,} rows in / {stats['rows_out']:,} priced "
+        f"in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)\n"
+        f"合計仕入れ: {int(total_purchase):,} 円 / 期待利益総額: {int(stats['total_profit']):,} 円 / ROI: {roi:.1f} %",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
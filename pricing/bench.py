@@ -0,0 +1,234 @@
+"""
+Benchmarks and regression baselines for the pricing and rendering hot paths.
+
+    python -m pricing.bench                 # run, compare with the baseline
+    python -m pricing.bench --update        # run and (re)write the baseline
+    python -m pricing.bench --quick         # skip the 1M-bean case
+    python -m pricing.bench --memory 100000 # bytes per lot, dicts vs columns
+
+Every case reports a throughput (items/sec, best of `--repeat` runs). Fast
+cases are called in a loop until one run takes at least 0.2 s
+(`timeit.Timer.autorange`), so timer resolution and scheduling noise do
+not dominate. When a baseline file exists, the run fails (exit code 1) if
+any case drops more than `--threshold` below its recorded throughput;
+cases faster than MIN_GATED_SECONDS per call are reported but not gated.
+Baselines are machine specific: record them on the box that runs the
+comparison.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .columnar import LotColumns, price_columns
+from .discount import discount_curve, discount_grid
+from .engine import DEFAULT_PLATFORM_FEE_RATE, DEFAULT_SALES_UNIT_G, price_lots
+from .inventory import DEFAULT_DAYS, project
+from .views import card_html, table_frame
+
+DEFAULT_BASELINE_PATH = "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_REPEAT = 5
+PRICING_SIZES = (10, 1_000, 100_000, 1_000_000)
+RENDER_SIZE = 1_000
+CHART_CURVES = 200
+PROJECTION_SIZE = (1_000, 100)  # beans, scenarios
+MIN_GATED_SECONDS = 0.001  # per call; faster cases vary too much between runs to gate
+
+
+def make_catalog(n, seed=0):
+    """Deterministic synthetic lot catalog of `n` beans."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "name": [f"Lot {i}" for i in range(n)],
+        "purchase_price": rng.integers(1, 500, n) * 100,
+        "purchase_weight_kg": np.round(rng.uniform(0.5, 60, n), 2),
+        "target_rate_retail": rng.integers(10, 81, n),
+        "target_rate_wholesale": rng.integers(10, 81, n),
+    })
+
+
+def _best_time(fn, repeat):
+    """Best seconds per call; each of the `repeat` runs loops `fn` for >= 0.2 s."""
+    timer = timeit.Timer(fn)
+    number, first = timer.autorange()
+    runs = [first] + timer.repeat(repeat - 1, number)
+    return min(runs) / number
+
+
+def run_benchmarks(sizes=PRICING_SIZES, repeat=DEFAULT_REPEAT):
+    """Returns {case: {"items", "seconds", "per_sec"}}."""
+    cases = {}
+
+    def record(name, items, fn, times=repeat):
+        seconds = _best_time(fn, times)
+        cases[name] = {"items": items, "seconds": seconds, "per_sec": items / seconds if seconds > 0 else float("inf")}
+
+    for n in sizes:
+        lots = make_catalog(n)
+        record(
+            f"pricing[{n}]", n,
+            lambda: price_lots(lots, DEFAULT_SALES_UNIT_G, DEFAULT_PLATFORM_FEE_RATE),
+            times=repeat if n < 1_000_000 else 1,
+        )
+        columns = LotColumns.from_frame(lots)
+        record(
+            f"price_columns[{n}]", n,
+            lambda: price_columns(columns, DEFAULT_SALES_UNIT_G, DEFAULT_PLATFORM_FEE_RATE),
+            times=repeat if n < 1_000_000 else 1,
+        )
+
+    results = price_lots(make_catalog(RENDER_SIZE)).to_dict("records")
+    record(f"card_html[{RENDER_SIZE}]", len(results), lambda: [card_html(r) for r in results])
+    record(f"table_frame[{RENDER_SIZE}]", len(results), lambda: table_frame(results))
+
+    # Bypass discount_grid's LRU cache so the computation itself is measured
+    curve_inputs = [(r["retail_price"], r["cost_per_bag"]) for r in results[:CHART_CURVES]]
+    record(
+        f"discount_curve[{len(curve_inputs)}]", len(curve_inputs),
+        lambda: [discount_curve(p, c, DEFAULT_SALES_UNIT_G, DEFAULT_PLATFORM_FEE_RATE, 200) for p, c in curve_inputs],
+    )
+    record(
+        f"discount_grid_0.1pct[{len(curve_inputs)}]", len(curve_inputs),
+        lambda: [discount_grid.__wrapped__(p, c, DEFAULT_SALES_UNIT_G, DEFAULT_PLATFORM_FEE_RATE) for p, c in curve_inputs],
+    )
+
+    beans, scenarios = PROJECTION_SIZE
+    catalog = make_catalog(beans)
+    record(
+        f"inventory_{DEFAULT_DAYS}d[{beans}x{scenarios}]", beans * scenarios,
+        lambda: project(catalog, daily_demand=1.5, n_scenarios=scenarios),
+    )
+    return cases
+
+
+def measure_memory(n, seed=0):
+    """
+    Bytes per lot held by today's dict layout (bean dicts + result dicts
+    with `raw_data`) and by LotColumns + ResultColumns, via tracemalloc.
+    """
+    catalog = make_catalog(n, seed)
+    catalog.insert(0, "id", np.arange(1, n + 1))
+    catalog.insert(2, "origin", [f"Origin {i % 50}" for i in range(n)])
+
+    def traced(build):
+        gc.collect()
+        tracemalloc.start()
+        kept = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return size
+
+    def dict_layout():
+        bean_store = catalog.to_dict("records")
+        priced = price_lots(bean_store)
+        results = [
+            {
+                "name": row["name"],
+                "retail_price": int(row["retail_price"]),
+                "wholesale_price": int(row["wholesale_price"]),
+                "profit": int(row["profit"]),
+                "cost_per_bag": int(row["cost_per_bag"]),
+                "units": int(row["units"]),
+                "breakeven_units": int(row["breakeven_units"]),
+                "raw_data": bean_store[i],
+            }
+            for i, row in zip(priced.index, priced.to_dict("records"))
+        ]
+        return bean_store, results
+
+    def columnar_layout():
+        lots = LotColumns.from_frame(catalog.set_index("id"))
+        return lots, price_columns(lots)
+
+    dict_bytes = traced(dict_layout)
+    columnar_bytes = traced(columnar_layout)
+    return {
+        "lots": n,
+        "dict_bytes_per_lot": dict_bytes / n,
+        "columnar_bytes_per_lot": columnar_bytes / n,
+        "ratio": dict_bytes / columnar_bytes if columnar_bytes else float("inf"),
+    }
+
+
+def compare(cases, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Gated cases (MIN_GATED_SECONDS or slower in the baseline) whose
+    throughput fell more than `threshold` below it.
+    """
+    regressions = []
+    for name, result in cases.items():
+        base = baseline.get("cases", {}).get(name)
+        if base and base["seconds"] >= MIN_GATED_SECONDS and result["per_sec"] < base["per_sec"] * (1 - threshold):
+            regressions.append((name, base["per_sec"], result["per_sec"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pricing.bench", description="価格計算・描画のベンチマーク")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="ベースライン JSON のパス")
+    parser.add_argument("--update", action="store_true", help="結果をベースラインとして保存する")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="許容する低下率 (0.20 = 20%%)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="各ケースの試行回数 (最速値を採用、速いケースは1回0.2秒以上になるまで繰り返す)")
+    parser.add_argument("--quick", action="store_true", help="1M 件のケースを省略する")
+    parser.add_argument("--memory", type=int, metavar="N", help="N 件でロット1件あたりのメモリ使用量 (dict とカラム形式) を計測して終了する")
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        m = measure_memory(args.memory)
+        print(f"dict layout       {m['dict_bytes_per_lot']:>10,.0f} bytes/lot")
+        print(f"columnar layout   {m['columnar_bytes_per_lot']:>10,.0f} bytes/lot  ({m['ratio']:.1f}x smaller, {m['lots']:,} lots)")
+        return 0
+
+    sizes = tuple(n for n in PRICING_SIZES if not (args.quick and n >= 1_000_000))
+    cases = run_benchmarks(sizes, args.repeat)
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+
+    for name, result in cases.items():
+        line = f"{name:<28} {result['per_sec']:>14,.0f} /sec  ({result['seconds'] * 1000:,.2f} ms)"
+        base = (baseline or {}).get("cases", {}).get(name)
+        if base:
+            line += f"  {result['per_sec'] / base['per_sec'] - 1:+.1%} vs baseline"
+            if base["seconds"] < MIN_GATED_SECONDS:
+                line += " (not gated)"
+        print(line)
+
+    if args.update or baseline is None:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "cases": cases,
+                },
+                f,
+                indent=2,
+            )
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(cases, baseline, args.threshold)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before:,.0f} -> {after:,.0f} /sec", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
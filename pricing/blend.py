@@ -0,0 +1,257 @@
+"""
+Blend costing: recipes that mix several lots by percentage.
+
+    python -m pricing.blend ingredients.csv --db lots.db -o blends.csv
+    python -m pricing.blend ingredients.csv --catalog lots.csv --recipes recipes.csv
+
+Each lot is roasted on its own (with its own roast loss) and the roasted
+beans are mixed, so a recipe's cost per roasted gram is the
+percentage-weighted sum of its lots' costs per roasted gram. All recipes
+form one sparse (recipes × lots) matrix of weights; costing every recipe
+is a single sparse matrix × cost vector product, so repricing thousands
+of blends after a lot price change is one vectorized step. Shelf prices
+then follow the single-origin rules (10-yen ceiling on the target cost
+rate).
+
+`ingredients` is a long table with one row per (recipe, lot, percent);
+lots are matched by store id, or by name for a plain catalog. `recipes`
+optionally sets each recipe's name, target rates and roasted batch size.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .engine import (
+    BREAKEVEN_SENTINEL,
+    DEFAULT_PLATFORM_FEE_RATE,
+    DEFAULT_SALES_UNIT_G,
+    LOSS_RATE,
+    ceil_to_10_yen,
+    to_frame,
+)
+
+INGREDIENT_COLUMNS = ["recipe", "lot", "percent"]
+RECIPE_DEFAULTS = {
+    "name": "",
+    "target_rate_retail": 30,
+    "target_rate_wholesale": 50,
+    "batch_weight_kg": 0.0,  # roasted blend to produce; 0 = per-bag figures only
+}
+PERCENT_TOLERANCE = 1e-6
+
+BLEND_COLUMNS = [
+    "name",
+    "valid",
+    "percent_total",
+    "cost_per_bag",
+    "retail_price",
+    "wholesale_price",
+    "profit_per_bag",
+    "units",
+    "batch_cost",
+    "expected_profit",
+    "breakeven_units",
+]
+
+
+def lot_cost_per_g(lots, loss_rate=LOSS_RATE):
+    """
+    Cost per roasted gram of every lot. A `loss_rate` column on `lots`
+    overrides the global roast loss per lot (blank / NaN entries keep
+    `loss_rate`); unusable lots give NaN.
+    """
+    loss = loss_rate
+    if "loss_rate" in lots:
+        per_lot = pd.to_numeric(lots["loss_rate"], errors="coerce").to_numpy(dtype=np.float64)
+        loss = np.where(np.isnan(per_lot), loss_rate, per_lot)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roasted_g = lots["purchase_weight_kg"].to_numpy(dtype=np.float64) * 1000 * (1 - np.asarray(loss))
+        cost = lots["purchase_price"].to_numpy(dtype=np.float64) / roasted_g
+    return np.where(roasted_g > 0, cost, np.nan)
+
+
+class BlendMatrix:
+    """
+    Sparse (recipes × lots) matrix of mix fractions in coordinate form.
+
+    Built once per recipe set; `dot` is the matrix × vector product over
+    the non-zero entries only.
+    """
+
+    def __init__(self, ingredients, lot_index, recipe_index=None):
+        ingredients = to_frame(ingredients)
+        missing = [c for c in INGREDIENT_COLUMNS if c not in ingredients]
+        if missing:
+            raise ValueError(f"ingredients need columns {INGREDIENT_COLUMNS}, missing {missing}")
+        lot_index = pd.Index(lot_index)
+        if recipe_index is None:
+            recipe_index = pd.Index(pd.unique(ingredients["recipe"]))
+        self.recipe_index = pd.Index(recipe_index)
+        self.lot_index = lot_index
+
+        self.rows = self.recipe_index.get_indexer(ingredients["recipe"])
+        self.cols = lot_index.get_indexer(ingredients["lot"])
+        unknown = ingredients["lot"][self.cols < 0]
+        if len(unknown):
+            raise ValueError(f"unknown lots in recipes: {sorted(set(unknown.astype(str)))[:10]}")
+        if (self.rows < 0).any():
+            raise ValueError("ingredients reference recipes that are not in recipe_index")
+        self.weights = ingredients["percent"].to_numpy(dtype=np.float64) / 100
+
+    @property
+    def shape(self):
+        return len(self.recipe_index), len(self.lot_index)
+
+    @property
+    def nnz(self):
+        return len(self.weights)
+
+    def dot(self, vector):
+        """Matrix × vector: one value per recipe."""
+        return np.bincount(self.rows, weights=self.weights * np.asarray(vector)[self.cols], minlength=self.shape[0])
+
+    def row_sums(self):
+        return np.bincount(self.rows, weights=self.weights, minlength=self.shape[0])
+
+    def recipes_using(self, lots):
+        """Positions of the recipes that contain any of `lots` (keys of the lot index; unknown keys are ignored)."""
+        positions = self.lot_index.get_indexer(list(lots))
+        touched = np.zeros(self.shape[1], dtype=bool)
+        touched[positions[positions >= 0]] = True
+        return np.unique(self.rows[touched[self.cols]])
+
+
+def _recipe_frame(recipes, recipe_index):
+    frame = pd.DataFrame(index=recipe_index)
+    if recipes is not None:
+        recipes = to_frame(recipes)
+        if "recipe" in recipes:
+            recipes = recipes.set_index("recipe")
+        frame = frame.join(recipes[[c for c in RECIPE_DEFAULTS if c in recipes]])
+    for col, default in RECIPE_DEFAULTS.items():
+        frame[col] = frame[col].fillna(default) if col in frame else default
+    names = frame["name"].astype(str)
+    frame["name"] = names.where(names != "", pd.Series(recipe_index.astype(str), index=recipe_index))
+    return frame
+
+
+def cost_blends(
+    matrix,
+    cost_per_g,
+    recipes=None,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+):
+    """
+    Prices every recipe of `matrix` from a per-lot cost vector (see
+    `lot_cost_per_g`). Returns a frame indexed by recipe with BLEND_COLUMNS;
+    `valid` is False when the mix does not add up to 100 % or uses a lot
+    that cannot be costed.
+    """
+    recipes = _recipe_frame(recipes, matrix.recipe_index)
+    percent_total = matrix.row_sums() * 100
+    cost_per_g = matrix.dot(cost_per_g)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        cost_per_bag = cost_per_g * sales_unit_g
+        retail = ceil_to_10_yen(cost_per_bag / (recipes["target_rate_retail"].to_numpy(dtype=np.float64) / 100))
+        wholesale = ceil_to_10_yen(cost_per_bag / (recipes["target_rate_wholesale"].to_numpy(dtype=np.float64) / 100))
+        valid = (
+            (np.abs(percent_total - 100) <= PERCENT_TOLERANCE * 100)
+            & np.isfinite(cost_per_bag) & np.isfinite(retail) & np.isfinite(wholesale)
+        )
+        retail_int = np.where(valid, retail, 0).astype(np.int64)
+        revenue_per_bag = retail_int * (1 - fee_rate)
+        profit_per_bag = revenue_per_bag - cost_per_bag
+
+        units = np.floor(recipes["batch_weight_kg"].to_numpy(dtype=np.float64) * 1000 / sales_unit_g)
+        batch_cost = cost_per_bag * units
+        expected_profit = profit_per_bag * units
+        has_revenue = revenue_per_bag > 0
+        breakeven = np.where(
+            has_revenue & (units > 0),
+            np.ceil(batch_cost / np.where(has_revenue, revenue_per_bag, 1.0)),
+            BREAKEVEN_SENTINEL,
+        )
+
+    zero = lambda a: np.where(valid, a, 0)
+    return pd.DataFrame(
+        {
+            "name": recipes["name"].to_numpy(),
+            "valid": valid,
+            "percent_total": percent_total,
+            "cost_per_bag": zero(cost_per_bag),
+            "retail_price": retail_int,
+            "wholesale_price": zero(wholesale).astype(np.int64),
+            "profit_per_bag": zero(profit_per_bag),
+            "units": zero(units).astype(np.int64),
+            "batch_cost": zero(batch_cost),
+            "expected_profit": zero(expected_profit),
+            "breakeven_units": np.where(valid & (units > 0), breakeven, 0).astype(np.int64),
+        },
+        index=matrix.recipe_index,
+        columns=BLEND_COLUMNS,
+    )
+
+
+def price_blends(
+    ingredients,
+    lots,
+    recipes=None,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    loss_rate=LOSS_RATE,
+):
+    """One-shot costing: `lots` is a lot frame indexed by the key the ingredients use."""
+    ingredients = to_frame(ingredients)
+    recipe_index = None
+    if recipes is not None:
+        recipes = to_frame(recipes)
+        if "recipe" in recipes:
+            # Recipes listed without ingredients are reported as invalid instead of dropped
+            recipe_index = pd.Index(pd.unique(pd.concat([ingredients["recipe"], recipes["recipe"]])))
+    matrix = BlendMatrix(ingredients, lots.index, recipe_index)
+    return cost_blends(matrix, lot_cost_per_g(lots, loss_rate), recipes, sales_unit_g, fee_rate)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pricing.blend", description="ブレンドの原価・価格計算")
+    parser.add_argument("ingredients", help="配合表 CSV (recipe, lot, percent)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", help="ロットの SQLite データベース (lot は id で指定)")
+    source.add_argument("--catalog", help="ロットの CSV / Parquet (lot は name で指定)")
+    parser.add_argument("--recipes", help="レシピ CSV (recipe, name, target_rate_retail, target_rate_wholesale, batch_weight_kg)")
+    parser.add_argument("-o", "--output", help="出力 CSV (デフォルト: 標準出力)")
+    parser.add_argument("--sales-unit-g", type=int, default=DEFAULT_SALES_UNIT_G)
+    parser.add_argument("--fee-rate", type=float, default=DEFAULT_PLATFORM_FEE_RATE)
+    parser.add_argument("--loss-rate", type=float, default=LOSS_RATE, help="焙煎ロス率 (--catalog の loss_rate 列が空のロットと --db のロットに適用)")
+    args = parser.parse_args(argv)
+
+    if args.catalog:
+        from .batch import iter_lot_chunks
+
+        lots = pd.concat(list(iter_lot_chunks(args.catalog, extra_columns=["loss_rate"])), ignore_index=True)
+        lots = lots.set_index("name", drop=False)
+        ingredients = pd.read_csv(args.ingredients, dtype={"lot": str}, keep_default_na=False)
+    else:
+        from .store import DEFAULT_DB_PATH, LotStore
+
+        store = LotStore(args.db or DEFAULT_DB_PATH)
+        lots = pd.concat(list(store.iter_frames()) or [pd.DataFrame(columns=["purchase_price", "purchase_weight_kg"])])
+        ingredients = pd.read_csv(args.ingredients)
+    recipes = pd.read_csv(args.recipes) if args.recipes else None
+
+    blends = price_blends(ingredients, lots, recipes, args.sales_unit_g, args.fee_rate, args.loss_rate)
+    blends.index.name = "recipe"
+    blends.to_csv(args.output or sys.stdout)
+    invalid = int((~blends["valid"]).sum())
+    if invalid:
+        print(f"{invalid:,} recipes could not be priced (percent total != 100 or unusable lots)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
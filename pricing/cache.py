@@ -0,0 +1,120 @@
+"""
+Dependency-tracked results cache for the Streamlit reruns.
+
+Each lot's priced row is cached together with the inputs it was computed
+from (the lot fields plus `sales_unit_g`, `fee_rate` and `loss_rate`).
+On every rerun only the lots whose signature changed are repriced, in one
+vectorized `price_lots` call, and the running totals are adjusted by the
+difference instead of being summed again.
+"""
+
+from collections import OrderedDict
+
+from .engine import DEFAULT_PLATFORM_FEE_RATE, DEFAULT_SALES_UNIT_G, LOSS_RATE, LOT_COLUMNS, price_lots
+
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+def lot_key(lot, position):
+    """Stable identity of a lot: its store id, or its position for plain dicts."""
+    return lot.get("id", position)
+
+
+def lot_signature(lot, sales_unit_g, fee_rate, loss_rate):
+    return tuple(lot[col] for col in LOT_COLUMNS) + (sales_unit_g, fee_rate, loss_rate)
+
+
+class ResultsCache:
+    """
+    Per-session cache of priced rows with incrementally maintained totals.
+
+    `total_purchase` / `total_profit` always describe the lots passed to the
+    last `update()` call. Entries for lots that drop out of view (e.g. after
+    paging) stay cached up to `max_entries` so coming back is a hit.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (signature, row or None)
+        self._current = set()
+        self.total_purchase = 0
+        self.total_profit = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def roi(self):
+        return (self.total_profit / self.total_purchase * 100) if self.total_purchase > 0 else 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        self.__init__(self.max_entries)
+
+    def _add_totals(self, row, sign):
+        if row is not None:
+            self.total_purchase += sign * row["purchase_price"]
+            self.total_profit += sign * row["expected_profit"]
+
+    def update(
+        self,
+        lots,
+        sales_unit_g=DEFAULT_SALES_UNIT_G,
+        fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+        loss_rate=LOSS_RATE,
+    ):
+        """
+        Brings the cache in line with `lots` (a list of bean dicts).
+
+        Returns `(lot, row)` pairs in lot order, where `row` is the priced
+        dict (as in `price_lots(...).to_dict("records")`). Inactive lots and
+        lots with no sellable units are skipped.
+        """
+        keys = [lot_key(lot, i) for i, lot in enumerate(lots)]
+        signatures = [lot_signature(lot, sales_unit_g, fee_rate, loss_rate) for lot in lots]
+
+        # Lots that left the view no longer count towards the totals
+        keyset = set(keys)
+        for key in self._current - keyset:
+            self._add_totals(self._entries[key][1], -1)
+
+        dirty = []
+        for pos, (key, signature) in enumerate(zip(keys, signatures)):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._current:
+                    self._add_totals(entry[1], +1)
+            else:
+                self.misses += 1
+                dirty.append(pos)
+
+        if dirty:
+            repriced = price_lots([lots[pos] for pos in dirty], sales_unit_g, fee_rate, loss_rate)
+            rows = dict(zip(repriced.index, repriced.to_dict("records")))
+            for i, pos in enumerate(dirty):
+                key = keys[pos]
+                old = self._entries.pop(key, None)
+                if old is not None and key in self._current:
+                    self._add_totals(old[1], -1)
+                row = rows.get(i)
+                self._entries[key] = (signatures[pos], row)
+                self._add_totals(row, +1)
+
+        self._current = keyset
+        # Lots on screen were just touched, so the least recently used ones are off screen
+        while len(self._entries) > max(self.max_entries, len(keyset)):
+            self._entries.popitem(last=False)
+
+        results = [
+            (lot, self._entries[key][1])
+            for lot, key in zip(lots, keys)
+            if self._entries[key][1] is not None
+        ]
+        if not results:
+            # Nothing priced on screen: reset so float deltas cannot drift
+            self.total_purchase = 0
+            self.total_profit = 0.0
+        return results
@@ -0,0 +1,250 @@
+"""
+Compact columnar layout for the lot catalog and priced results.
+
+A lot is stored as a handful of typed NumPy columns instead of a Python
+dict: integer yen, weights as fixed-point grams, cost rates in 0.01%
+steps, and names as one UTF-8 buffer plus offsets (the Arrow string
+layout). `price_columns` prices a `LotColumns` table straight from these
+arrays, and `select_page` / `cards_html` / `table_frame` read a
+`ResultColumns` table column by column, so no per-row dicts are built.
+
+Fixed-point values are decoded to exactly the floats the dict path would
+hold for inputs with at most 3 decimals in kg and 2 in %, so prices are
+bit-identical to `price_lots`.
+
+`python -m pricing.bench --memory` measures the memory per lot against
+the dict layout.
+
+Conversion to / from Arrow tables needs `pyarrow` (pip install pyarrow).
+"""
+
+import numpy as np
+import pandas as pd
+
+from .compat import require_pyarrow
+from .engine import DEFAULT_PLATFORM_FEE_RATE, DEFAULT_SALES_UNIT_G, LOSS_RATE, price_arrays, to_frame
+
+WEIGHT_SCALE = 1000  # purchase_weight_kg -> grams
+RATE_SCALE = 100     # target rate (%) -> 0.01 % steps
+
+LOT_ARRAY_DTYPES = {
+    "purchase_price": np.int32,   # JPY
+    "weight_g": np.int32,
+    "rate_retail": np.int16,      # 0.01 %
+    "rate_wholesale": np.int16,   # 0.01 %
+}
+
+RESULT_ARRAY_DTYPES = {
+    "retail_price": np.int32,
+    "wholesale_price": np.int32,
+    "profit": np.int64,
+    "cost_per_bag": np.int32,
+    "units": np.int32,
+    "breakeven_units": np.int32,
+    "expected_profit": np.float64,
+    "purchase_price": np.int32,
+}
+
+
+class StringColumn:
+    """UTF-8 strings packed into one byte buffer with int64 offsets."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_list(cls, values):
+        encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def tolist(self):
+        buffer = self.data.tobytes()
+        bounds = self.offsets.tolist()
+        return [buffer[a:b].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def take(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        starts, stops = self.offsets[positions], self.offsets[positions + 1]
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(stops - starts, out=offsets[1:])
+        # Byte positions of every selected string, gathered in one fancy-index
+        source = np.repeat(starts - offsets[:-1], stops - starts) + np.arange(offsets[-1])
+        return StringColumn(self.data[source], offsets)
+
+    @classmethod
+    def concat(cls, columns):
+        columns = list(columns)
+        if not columns:
+            return cls(np.empty(0, dtype=np.uint8), np.zeros(1, dtype=np.int64))
+        shifts = np.cumsum([0] + [len(c.data) for c in columns[:-1]])
+        offsets = np.concatenate([columns[0].offsets[:1]] + [c.offsets[1:] + s for c, s in zip(columns, shifts)])
+        return cls(np.concatenate([c.data for c in columns]), offsets)
+
+
+class ColumnTable:
+    """
+    A name column plus typed NumPy arrays, with an int64 index (store ids
+    or input positions) to trace rows back to their lot.
+
+    `table[col]` returns the NumPy array (or the StringColumn for `name`),
+    so code written against a DataFrame's columns works unchanged.
+    """
+
+    ARRAY_DTYPES = {}
+
+    def __init__(self, names, arrays, index=None):
+        self.names = names
+        self.arrays = {col: np.asarray(arrays[col], dtype=dtype) for col, dtype in self.ARRAY_DTYPES.items()}
+        self.index = np.arange(len(names), dtype=np.int64) if index is None else np.asarray(index, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, col):
+        if col == "name":
+            return self.names
+        return self.arrays[col]
+
+    def __contains__(self, col):
+        return col == "name" or col in self.arrays
+
+    @property
+    def nbytes(self):
+        return self.names.nbytes + self.index.nbytes + sum(a.nbytes for a in self.arrays.values())
+
+    def take(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        return type(self)(
+            self.names.take(positions),
+            {col: a[positions] for col, a in self.arrays.items()},
+            self.index[positions],
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        tables = list(tables)
+        return cls(
+            StringColumn.concat(t.names for t in tables),
+            {col: np.concatenate([t.arrays[col] for t in tables] or [np.empty(0)]) for col in cls.ARRAY_DTYPES},
+            np.concatenate([t.index for t in tables] or [np.empty(0)]),
+        )
+
+    def to_frame(self):
+        return pd.DataFrame({"name": self.names.tolist(), **self.arrays}, index=self.index)
+
+    def to_arrow(self):
+        """Zero-copy `pyarrow.Table` (names as large_string, index as `_index`)."""
+        pa = require_pyarrow("Arrow 形式の変換")
+        names = pa.Array.from_buffers(
+            pa.large_string(), len(self.names),
+            [None, pa.py_buffer(self.names.offsets), pa.py_buffer(self.names.data)],
+        )
+        return pa.table({"_index": self.index, "name": names, **self.arrays})
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Inverse of `to_arrow`; the arrays are views on the Arrow buffers when possible."""
+        pa = require_pyarrow("Arrow 形式の変換")
+        table = table.combine_chunks()
+        names = table.column("name").chunk(0) if table.num_rows else pa.array([], pa.large_string())
+        names = names.cast(pa.large_string())
+        _, offsets, data = names.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int64, count=len(names) + 1, offset=names.offset * 8) if offsets else np.zeros(1, dtype=np.int64)
+        data = np.frombuffer(data, dtype=np.uint8) if data else np.empty(0, dtype=np.uint8)
+        column = lambda col: table.column(col).to_numpy() if table.num_rows else np.empty(0)
+        return cls(
+            StringColumn(data, offsets),
+            {col: column(col) for col in cls.ARRAY_DTYPES},
+            column("_index"),
+        )
+
+
+class LotColumns(ColumnTable):
+    """The lot catalog; reads back the LOT_COLUMNS as the engine expects them."""
+
+    ARRAY_DTYPES = LOT_ARRAY_DTYPES
+
+    @classmethod
+    def from_frame(cls, lots):
+        """From a lot DataFrame (e.g. `LotStore.iter_frames`) or a list of bean dicts."""
+        lots = to_frame(lots)
+        index = lots.index if pd.api.types.is_integer_dtype(lots.index) else None
+        return cls(
+            StringColumn.from_list(lots["name"].tolist()),
+            {
+                "purchase_price": lots["purchase_price"].to_numpy(),
+                "weight_g": np.round(lots["purchase_weight_kg"].to_numpy(dtype=np.float64) * WEIGHT_SCALE),
+                "rate_retail": np.round(lots["target_rate_retail"].to_numpy(dtype=np.float64) * RATE_SCALE),
+                "rate_wholesale": np.round(lots["target_rate_wholesale"].to_numpy(dtype=np.float64) * RATE_SCALE),
+            },
+            index,
+        )
+
+    def __getitem__(self, col):
+        if col == "purchase_weight_kg":
+            return self.arrays["weight_g"] / WEIGHT_SCALE
+        if col == "target_rate_retail":
+            return self.arrays["rate_retail"] / RATE_SCALE
+        if col == "target_rate_wholesale":
+            return self.arrays["rate_wholesale"] / RATE_SCALE
+        return super().__getitem__(col)
+
+
+class ResultColumns(ColumnTable):
+    """Priced rows (RESULT_COLUMNS + expected_profit and purchase_price)."""
+
+    ARRAY_DTYPES = RESULT_ARRAY_DTYPES
+
+
+def price_columns(
+    lots,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    loss_rate=LOSS_RATE,
+):
+    """
+    `price_lots` for a LotColumns table: same rules and filtering, returns
+    a ResultColumns table whose index points back at the priced lots.
+    """
+    price = lots["purchase_price"]
+    weight_kg = lots["purchase_weight_kg"]
+    active = np.flatnonzero((lots.names.lengths() > 0) & (price > 0) & (weight_kg > 0))
+
+    priced = price_arrays(
+        price[active],
+        weight_kg[active],
+        lots["target_rate_retail"][active],
+        lots["target_rate_wholesale"][active],
+        sales_unit_g=sales_unit_g,
+        fee_rate=fee_rate,
+        loss_rate=loss_rate,
+    )
+    valid = priced["valid"]
+    rows = active[valid]
+    return ResultColumns(
+        lots.names.take(rows),
+        {
+            "retail_price": priced["retail_price"][valid],
+            "wholesale_price": priced["wholesale_price"][valid],
+            "profit": np.trunc(priced["expected_profit"][valid]),
+            "cost_per_bag": np.trunc(priced["cost_per_bag"][valid]),
+            "units": priced["units"][valid],
+            "breakeven_units": priced["breakeven_units"][valid],
+            "expected_profit": priced["expected_profit"][valid],
+            "purchase_price": price[rows],
+        },
+        lots.index[rows],
+    )
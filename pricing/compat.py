@@ -0,0 +1,28 @@
+"""
+Optional dependencies.
+
+`pyarrow` is only needed for Parquet files, Arrow conversion and results
+snapshots, so it is imported on first use rather than at package import.
+"""
+
+import importlib
+
+
+def optional_pyarrow(*submodules):
+    """`pyarrow` with `submodules` (e.g. "parquet", "ipc") imported, or None if it is not installed."""
+    try:
+        import pyarrow
+
+        for name in submodules:
+            importlib.import_module(f"pyarrow.{name}")
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def require_pyarrow(purpose, *submodules):
+    """Like `optional_pyarrow`, but exits with an install hint naming `purpose`."""
+    pa = optional_pyarrow(*submodules)
+    if pa is None:
+        raise SystemExit(f"{purpose}には pyarrow が必要です: pip install pyarrow")
+    return pa
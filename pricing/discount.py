@@ -0,0 +1,111 @@
+"""
+Volume discount / big-bag pricing (割引・大袋シミュレーター).
+
+The same rules as the simulator panel, evaluated over whole grids of bag
+sizes × discount rates at once. Grids are LRU-cached on their scalar
+inputs (as read-only arrays), so moving an unrelated slider does not
+regenerate identical series; the app caches the chart built from
+`discount_curve` itself.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .engine import ceil_to_10_yen
+
+DEFAULT_BAG_SIZES = tuple(range(100, 1001, 100))
+MAX_DISCOUNT_PERCENT = 50
+
+STATUS_DANGER = "danger"
+STATUS_WARNING = "warning"
+STATUS_SAFE = "safe"
+
+
+def discount_steps(max_percent=MAX_DISCOUNT_PERCENT, step_percent=5):
+    """Discount percentages 0, step, 2*step, ... max_percent (inclusive)."""
+    count = int(round(max_percent / step_percent)) + 1
+    return np.round(np.arange(count) * step_percent, 6)
+
+
+def bag_metrics(retail_price, cost_per_bag, sales_unit_g, big_bag_g, discount_percent, fee_rate):
+    """
+    Price / cost / fee / profit for a big bag sold at a discount.
+
+    Arguments broadcast against each other (e.g. bag sizes as a column and
+    discounts as a row give a bags × discounts grid). The operation order
+    matches the simulator panel exactly.
+    """
+    big_bag_g = np.asarray(big_bag_g)
+    rate = np.asarray(discount_percent) / 100.0
+
+    base_price_per_g = retail_price / sales_unit_g
+    scaled_retail_price_raw = base_price_per_g * big_bag_g
+    final_price = ceil_to_10_yen(scaled_retail_price_raw * (1 - rate))
+
+    base_cost_per_g = cost_per_bag / sales_unit_g
+    bag_cost = base_cost_per_g * big_bag_g
+    fee = final_price * fee_rate
+    profit = final_price - bag_cost - fee
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost_rate = np.where(final_price > 0, bag_cost / final_price * 100, 100.0)
+
+    return {
+        "final_price": final_price,
+        "bag_cost": bag_cost,
+        "fee": fee,
+        "profit": profit,
+        "cost_rate": cost_rate,
+    }
+
+
+def is_safe(profit, cost_rate, target_rate_wholesale):
+    """The "Safe" band as a boolean mask (no string arrays for large grids)."""
+    return ~(np.asarray(profit) < 0) & (np.asarray(cost_rate) <= target_rate_wholesale)
+
+
+def bag_status(profit, cost_rate, target_rate_wholesale):
+    """Danger (赤字) / Safe (卸売目標以下の原価率) / Warning, element-wise."""
+    return np.select(
+        [np.asarray(profit) < 0, np.asarray(cost_rate) <= target_rate_wholesale],
+        [STATUS_DANGER, STATUS_SAFE],
+        STATUS_WARNING,
+    )
+
+
+def wholesale_reference_profit(bag_cost, target_rate_wholesale, fee_rate):
+    """Profit per bag if the big bag were priced at the wholesale cost rate."""
+    wholesale_price = ceil_to_10_yen(bag_cost / (target_rate_wholesale / 100))
+    return wholesale_price - bag_cost - (wholesale_price * fee_rate)
+
+
+def _freeze(arrays):
+    for value in arrays.values():
+        value.setflags(write=False)
+    return arrays
+
+
+def discount_curve(retail_price, cost_per_bag, sales_unit_g, fee_rate, big_bag_g, step_percent=5, max_percent=MAX_DISCOUNT_PERCENT):
+    """Profit-vs-discount series for one bag size, as a new chart DataFrame."""
+    discounts = discount_steps(max_percent, step_percent)
+    metrics = bag_metrics(retail_price, cost_per_bag, sales_unit_g, big_bag_g, discounts, fee_rate)
+    return pd.DataFrame({
+        "Discount (%)": discounts if step_percent % 1 else discounts.astype(np.int64),
+        "Profit (JPY)": np.trunc(metrics["profit"]).astype(np.int64),
+    })
+
+
+@lru_cache(maxsize=64)
+def discount_grid(retail_price, cost_per_bag, sales_unit_g, fee_rate, bag_sizes=DEFAULT_BAG_SIZES, step_percent=0.1, max_percent=MAX_DISCOUNT_PERCENT):
+    """
+    Every bag size × every discount step as 2-D arrays (rows = bag sizes).
+
+    Returns a dict with `bag_sizes`, `discounts` and the `bag_metrics`
+    grids. The arrays are shared between callers and read-only.
+    """
+    bags = np.asarray(bag_sizes, dtype=np.float64)
+    discounts = discount_steps(max_percent, step_percent)
+    metrics = bag_metrics(retail_price, cost_per_bag, sales_unit_g, bags[:, None], discounts[None, :], fee_rate)
+    return _freeze({"bag_sizes": bags, "discounts": discounts, **metrics})
@@ -0,0 +1,204 @@
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# --- 1. 定数設定 ---
+LOSS_RATE = 0.20  # 焙煎による重量目減り率 20%
+TAX_RATE = 0.08   # 消費税率 8% (軽減税率)
+DEFAULT_PLATFORM_FEE_RATE = 0.10 # プラットフォーム手数料 10%
+DEFAULT_SALES_UNIT_G = 100
+
+BREAKEVEN_SENTINEL = 999999  # 損益分岐に到達しない場合の表示値
+MAX_RESULT = 2.0**53  # 整数で返す計算結果の上限 (float64 で正確に表せる範囲)
+
+LOT_COLUMNS = [
+    "name",
+    "purchase_price",
+    "purchase_weight_kg",
+    "target_rate_retail",
+    "target_rate_wholesale",
+]
+
+RESULT_COLUMNS = [
+    "name",
+    "retail_price",
+    "wholesale_price",
+    "profit",
+    "cost_per_bag",
+    "units",
+    "breakeven_units",
+]
+
+
+def ceil_to_10_yen(price_raw):
+    """Rounds raw prices up to the next 10 yen (math.ceil(x / 10) * 10)."""
+    return np.ceil(np.asarray(price_raw, dtype=np.float64) / 10) * 10
+
+
+def price_arrays(
+    purchase_price,
+    purchase_weight_kg,
+    target_rate_retail,
+    target_rate_wholesale,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    loss_rate=LOSS_RATE,
+    retail_price=None,
+):
+    """
+    Vectorized pricing rules for a batch of lots.
+
+    Every argument may be a scalar or an array; they are broadcast against
+    each other, so per-lot loss rates or fee scenarios work the same way as
+    the global constants. The float operations are applied in the same order
+    as the original per-bean loop, so results are bit-identical to it.
+    Rows with `sellable_units <= 0`, or whose results are not finite or do
+    not fit the integer columns (above MAX_RESULT), are flagged by
+    `valid == False` and get zeros.
+
+    `retail_price` pins the shelf price instead of deriving it from the
+    target cost rate (breakeven and profit are then evaluated at that price).
+    """
+    purchase_price = np.asarray(purchase_price)
+    purchase_weight_kg = np.asarray(purchase_weight_kg, dtype=np.float64)
+    target_rate_retail = np.asarray(target_rate_retail)
+    target_rate_wholesale = np.asarray(target_rate_wholesale)
+    fee_rate = np.asarray(fee_rate, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        roasted_weight_g = purchase_weight_kg * 1000 * (1 - np.asarray(loss_rate, dtype=np.float64))
+        sellable_units = np.floor(roasted_weight_g / sales_unit_g)
+        valid = (sellable_units > 0) & (sellable_units <= MAX_RESULT)
+        units = np.where(valid, sellable_units, 0).astype(np.int64)
+
+        cost_per_bag = np.where(valid, purchase_price / np.where(valid, units, 1), 0.0)
+
+        # Retail / Wholesale Price
+        if retail_price is None:
+            price_retail = ceil_to_10_yen(cost_per_bag / (target_rate_retail / 100))
+        else:
+            price_retail = np.asarray(retail_price, dtype=np.float64)
+        price_wholesale = ceil_to_10_yen(cost_per_bag / (target_rate_wholesale / 100))
+        valid = valid & (np.abs(price_retail) <= MAX_RESULT) & (price_wholesale <= MAX_RESULT)
+        price_retail = np.where(valid, price_retail, 0.0)
+        price_wholesale = np.where(valid, price_wholesale, 0.0)
+        retail_int = price_retail.astype(np.int64)
+
+        # Breakeven Units
+        revenue_per_bag = retail_int * (1 - fee_rate)
+        has_revenue = revenue_per_bag > 0
+        breakeven_units = np.where(
+            has_revenue,
+            np.ceil(purchase_price / np.where(has_revenue, revenue_per_bag, 1.0)),
+            BREAKEVEN_SENTINEL,
+        )
+
+        expected_profit = (retail_int * units * (1 - fee_rate)) - purchase_price
+        # NaN / huge fee rates or prices: the row cannot be priced
+        valid = valid & (np.abs(expected_profit) <= MAX_RESULT) & (breakeven_units <= MAX_RESULT)
+
+    return {
+        "valid": valid,
+        "roasted_weight_g": roasted_weight_g,
+        "units": np.where(valid, units, 0),
+        "cost_per_bag": cost_per_bag,
+        "retail_price": np.where(valid, retail_int, 0),
+        "wholesale_price": np.where(valid, price_wholesale, 0.0).astype(np.int64),
+        "revenue_per_bag": revenue_per_bag,
+        "breakeven_units": np.where(valid, breakeven_units, 0).astype(np.int64),
+        "expected_profit": np.where(valid, expected_profit, 0.0),
+    }
+
+
+def to_frame(data, columns=None):
+    """A DataFrame (returned as is), a mapping of columns or an iterable of row dicts as a DataFrame."""
+    if isinstance(data, pd.DataFrame):
+        return data
+    if not isinstance(data, Mapping):
+        data = list(data)
+    return pd.DataFrame(data, columns=columns)
+
+
+def to_lot_frame(lots):
+    """Accepts a DataFrame, a mapping of columns or a list of bean dicts (keeps the LOT_COLUMNS)."""
+    return to_frame(lots, LOT_COLUMNS)
+
+
+def active_mask(lots):
+    """Same filter as the input form: a name, a price and a weight are required."""
+    lots = to_lot_frame(lots)
+    names = lots["name"].fillna("").astype(str)
+    return (
+        (names != "")
+        & (lots["purchase_price"] > 0)
+        & (lots["purchase_weight_kg"] > 0)
+    ).to_numpy()
+
+
+def price_lots(
+    lots,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    loss_rate=LOSS_RATE,
+):
+    """
+    Prices a columnar batch of lots in one pass.
+
+    Returns a DataFrame with the RESULT_COLUMNS (integer yen, as shown in
+    the UI) plus `expected_profit` as the unrounded float used for totals,
+    and the lot's input columns. Inactive lots
+    and lots with `sellable_units <= 0` are dropped; the original index is
+    kept so each row can be traced back to its input lot.
+    """
+    lots = to_lot_frame(lots)
+    lots = lots[active_mask(lots)]
+
+    priced = price_arrays(
+        lots["purchase_price"].to_numpy(),
+        lots["purchase_weight_kg"].to_numpy(),
+        lots["target_rate_retail"].to_numpy(),
+        lots["target_rate_wholesale"].to_numpy(),
+        sales_unit_g=sales_unit_g,
+        fee_rate=fee_rate,
+        loss_rate=loss_rate,
+    )
+    valid = priced["valid"]
+
+    results = pd.DataFrame(
+        {
+            "name": lots["name"].to_numpy()[valid],
+            "retail_price": priced["retail_price"][valid],
+            "wholesale_price": priced["wholesale_price"][valid],
+            "profit": np.trunc(priced["expected_profit"][valid]).astype(np.int64),
+            "cost_per_bag": np.trunc(priced["cost_per_bag"][valid]).astype(np.int64),
+            "units": priced["units"][valid],
+            "breakeven_units": priced["breakeven_units"][valid],
+            "expected_profit": priced["expected_profit"][valid],
+            "purchase_price": lots["purchase_price"].to_numpy()[valid],
+            "purchase_weight_kg": lots["purchase_weight_kg"].to_numpy()[valid],
+            "target_rate_retail": lots["target_rate_retail"].to_numpy()[valid],
+            "target_rate_wholesale": lots["target_rate_wholesale"].to_numpy()[valid],
+        },
+        index=lots.index[valid],
+    )
+    return results
+
+
+def summarize(results):
+    """
+    Totals for the metric cards: (total_purchase, total_profit, roi).
+
+    The profit total is accumulated left to right (like `total += x` in a
+    loop) rather than pairwise, so it matches the scalar loop exactly.
+    Purchase prices are summed in their own kind (integer yen, or floats
+    when a catalog had fractional prices); round only for display.
+    """
+    if len(results) == 0:
+        return 0, 0, 0
+    purchase = np.asarray(results["purchase_price"])
+    dtype = np.float64 if purchase.dtype.kind == "f" else np.int64
+    total_purchase = np.add.accumulate(purchase, dtype=dtype)[-1].item()
+    total_profit = float(np.add.accumulate(np.asarray(results["expected_profit"]))[-1])
+    roi = (total_profit / total_purchase * 100) if total_purchase > 0 else 0
+    return total_purchase, total_profit, roi
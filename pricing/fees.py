@@ -0,0 +1,162 @@
+"""
+Fee schedules for sales channels (platforms and in-store payments).
+
+Mirrors `calculatePlatformFee` in utils/calculations.ts: a fee is
+`rate * price + fixed`, floored to whole yen. The app's original flat 10%
+platform fee is kept as an unrounded schedule so it reproduces
+`price_lots` exactly. Every bean is evaluated against every channel as one
+(beans × channels) broadcast.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .engine import (
+    BREAKEVEN_SENTINEL,
+    DEFAULT_PLATFORM_FEE_RATE,
+    DEFAULT_SALES_UNIT_G,
+    LOSS_RATE,
+    active_mask,
+    price_arrays,
+    to_frame,
+    to_lot_frame,
+)
+
+ROUND_FLOOR = "floor"  # Math.floor(price * rate + fixed), as on the Next.js side
+ROUND_NONE = "none"    # price * rate, as in app.py
+
+FEE_SCHEDULE_COLUMNS = ["channel", "rate", "fixed", "rounding"]
+
+DEFAULT_FEE_SCHEDULES = pd.DataFrame(
+    [
+        ("PLATFORM_10", DEFAULT_PLATFORM_FEE_RATE, 0, ROUND_NONE),
+        ("BASE_STANDARD", 0.066, 40, ROUND_FLOOR),
+        ("BASE_GROWTH", 0.029, 0, ROUND_FLOOR),
+        ("STORES_FREE", 0.05, 0, ROUND_FLOOR),
+        ("STORES_STANDARD", 0.036, 0, ROUND_FLOOR),
+        ("SHOPIFY_BASIC", 0.034, 0, ROUND_FLOOR),
+        ("SHOPIFY_STANDARD", 0.033, 0, ROUND_FLOOR),
+        ("SHOPIFY_ADVANCED", 0.032, 0, ROUND_FLOOR),
+        ("IN_STORE_CASH", 0.0, 0, ROUND_FLOOR),
+        ("IN_STORE_PAYPAY", 0.0198, 0, ROUND_FLOOR),
+        ("IN_STORE_CARD", 0.0324, 0, ROUND_FLOOR),
+    ],
+    columns=FEE_SCHEDULE_COLUMNS,
+)
+
+
+def to_schedule_frame(schedules):
+    """Accepts a DataFrame or a list of dicts; `fixed` and `rounding` are optional."""
+    frame = to_frame(schedules)
+    if "fixed" not in frame:
+        frame = frame.assign(fixed=0)
+    if "rounding" not in frame:
+        frame = frame.assign(rounding=ROUND_FLOOR)
+    unknown = set(frame["rounding"]) - {ROUND_FLOOR, ROUND_NONE}
+    if unknown:
+        raise ValueError(f"unknown rounding: {sorted(unknown)}")
+    return frame[FEE_SCHEDULE_COLUMNS].reset_index(drop=True)
+
+
+def fee_per_bag(price, rate, fixed, floor):
+    """Fee for a bag sold at `price`; all arguments broadcast."""
+    raw = price * rate + fixed
+    return np.where(floor, np.floor(raw), raw)
+
+
+def price_channel_arrays(
+    purchase_price,
+    purchase_weight_kg,
+    target_rate_retail,
+    target_rate_wholesale,
+    schedules=DEFAULT_FEE_SCHEDULES,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    loss_rate=LOSS_RATE,
+):
+    """
+    Pricing rules for every lot × every fee schedule.
+
+    Lot arguments are 1-D arrays of length B; the result holds per-lot
+    arrays (`valid`, `units`, `retail_price`, ...) and (B, C) matrices
+    `fee_per_bag`, `revenue_per_bag`, `profit` and `breakeven_units` for
+    the C schedules.
+    """
+    schedules = to_schedule_frame(schedules)
+    rate = schedules["rate"].to_numpy(dtype=np.float64)[None, :]
+    fixed = schedules["fixed"].to_numpy(dtype=np.float64)[None, :]
+    floor = (schedules["rounding"] == ROUND_FLOOR).to_numpy()[None, :]
+
+    base = price_arrays(
+        purchase_price, purchase_weight_kg, target_rate_retail, target_rate_wholesale,
+        sales_unit_g=sales_unit_g, fee_rate=0.0, loss_rate=loss_rate,
+    )
+    valid = base["valid"][:, None]
+    retail = base["retail_price"][:, None]
+    units = base["units"][:, None]
+    price = np.asarray(purchase_price)[:, None]
+
+    fee = fee_per_bag(retail, rate, fixed, floor)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Unrounded schedules keep app.py's `price * (1 - fee_rate)` operation order
+        revenue_per_bag = np.where(floor, retail - fee, retail * (1 - rate) - fixed)
+        gross = retail * units
+        profit = np.where(floor, (retail - fee) * units, gross * (1 - rate) - fixed * units) - price
+        has_revenue = revenue_per_bag > 0
+        breakeven = np.where(
+            has_revenue,
+            np.ceil(price / np.where(has_revenue, revenue_per_bag, 1.0)),
+            BREAKEVEN_SENTINEL,
+        )
+
+    per_lot = ("valid", "roasted_weight_g", "units", "cost_per_bag", "retail_price", "wholesale_price")
+    return {
+        **{key: base[key] for key in per_lot},
+        "channels": schedules["channel"].to_numpy(),
+        "fee_per_bag": np.where(valid, fee, 0.0),
+        "revenue_per_bag": np.where(valid, revenue_per_bag, 0.0),
+        "profit": np.where(valid, profit, 0.0),
+        "breakeven_units": np.where(valid, breakeven, 0).astype(np.int64),
+    }
+
+
+def compare_channels(
+    lots,
+    schedules=DEFAULT_FEE_SCHEDULES,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    loss_rate=LOSS_RATE,
+):
+    """
+    Channel comparison for a lot batch as a wide DataFrame.
+
+    Columns are a (metric, channel) MultiIndex for `fee_per_bag`, `profit`
+    and `breakeven_units`, plus `name`, `retail_price` and `units`. Rows
+    follow `price_lots`: inactive / unsellable lots are dropped and the
+    input index is kept. Profit is truncated to whole yen like the UI.
+    """
+    lots = to_lot_frame(lots)
+    lots = lots[active_mask(lots)]
+    priced = price_channel_arrays(
+        lots["purchase_price"].to_numpy(),
+        lots["purchase_weight_kg"].to_numpy(),
+        lots["target_rate_retail"].to_numpy(),
+        lots["target_rate_wholesale"].to_numpy(),
+        schedules=schedules,
+        sales_unit_g=sales_unit_g,
+        loss_rate=loss_rate,
+    )
+    valid = priced["valid"]
+    channels = priced["channels"]
+
+    blocks = {
+        ("name", ""): lots["name"].to_numpy()[valid],
+        ("retail_price", ""): priced["retail_price"][valid],
+        ("units", ""): priced["units"][valid],
+    }
+    for metric, values in (
+        ("fee_per_bag", priced["fee_per_bag"]),
+        ("profit", np.trunc(priced["profit"]).astype(np.int64)),
+        ("breakeven_units", priced["breakeven_units"]),
+    ):
+        for j, channel in enumerate(channels):
+            blocks[(metric, channel)] = values[valid, j]
+    return pd.DataFrame(blocks, index=lots.index[valid])
@@ -0,0 +1,290 @@
+"""
+Inventory-aware cash flow projection: roast schedule, daily demand and
+shelf life.
+
+`expected_profit` assumes every bag of the lot sells at once. `project`
+instead steps day by day through a horizon: the green lot is paid on day
+0, roasted in batches on roast days whenever fresh stock runs low, bags
+sell against random daily demand (oldest first), and bags older than the
+shelf life are written off. Unmet demand is lost, not back-ordered.
+
+All beans and scenarios advance together as one (beans × scenarios)
+array per day. Stock is kept as cumulative counters (bags roasted, bags
+gone) plus a ring buffer of the last `shelf_life_days` roasted totals, so
+FIFO ageing costs O(1) per day regardless of the shelf life. Each
+scenario draws a demand level per bean (`demand_factor`) and Poisson
+daily demand around it, sampled from a per-cell CDF table.
+
+Batches are roasted from whole grams of green beans; the roasted remainder
+below one bag is not sold, so a lot can yield fewer bags than `units`.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from .engine import BREAKEVEN_SENTINEL, DEFAULT_PLATFORM_FEE_RATE, DEFAULT_SALES_UNIT_G, LOSS_RATE, price_arrays, to_frame
+from .montecarlo import sample
+
+DEFAULT_DAYS = 365
+DEFAULT_ROAST_BATCH_KG = 3.0   # green beans per roast
+DEFAULT_ROAST_INTERVAL_DAYS = 7
+DEFAULT_SHELF_LIFE_DAYS = 30   # days a roasted bag can be sold, roast day included
+DEFAULT_DEMAND_FACTOR_DIST = ("normal", 1.0, 0.2)  # multiplier on daily_demand per scenario
+DEFAULT_PERCENTILES = (5, 50, 95)
+DEFAULT_MAX_ELEMENTS = 50_000   # beans × scenarios stepped together
+POISSON_TABLE_MAX_K = 64        # above this many demand levels, draw with rng.poisson
+POISSON_TAIL = 1e-7
+
+SUMMARY_COLUMNS = [
+    "cash_mean",
+    "loss_probability",
+    "sold_mean",
+    "written_off_mean",
+    "written_off_cost_mean",
+    "lost_sales_mean",
+    "stockout_days_mean",
+    "roasts_mean",
+    "stock_left_mean",
+    "green_left_kg_mean",
+]
+
+
+def _roast_plan(green_g, batch_g, loss_rate, sales_unit_g):
+    """Per bean: number of batches, bags per full batch and bags in the last one."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n_batches = np.where(batch_g > 0, np.ceil(green_g / np.where(batch_g > 0, batch_g, 1)), 0)
+        last_g = green_g - (n_batches - 1) * batch_g
+        batch_bags = np.floor(batch_g * (1 - loss_rate) / sales_unit_g)
+        last_bags = np.floor(last_g * (1 - loss_rate) / sales_unit_g)
+    n_batches = np.where(batch_bags > 0, n_batches, 0)
+    return n_batches.astype(np.int32), batch_bags.astype(np.int32), np.maximum(last_bags, 0).astype(np.int32)
+
+
+def _poisson_sampler(rng, lam):
+    """
+    Returns a function drawing Poisson(lam) for every cell (flattened), by inverse
+    transform on a per-cell CDF table: one float32 uniform per cell and a
+    few comparisons, instead of several uniforms per draw in rng.poisson.
+    Most cells are resolved by the first rows; only the tail (< 0.5 % of
+    cells) is looked up further.
+    """
+    lam_max = float(lam.max()) if lam.size else 0.0
+    k, p = 1, math.exp(-lam_max)
+    tail = 1 - p
+    while tail > POISSON_TAIL and k <= POISSON_TABLE_MAX_K:
+        p *= lam_max / k
+        tail -= p
+        k += 1
+    if k > POISSON_TABLE_MAX_K:
+        return lambda: rng.poisson(lam).ravel()
+
+    flat = lam.ravel()
+    cdf = np.empty((k, flat.size), dtype=np.float32)
+    p = np.exp(-flat)
+    total = p.copy()
+    cdf[0] = total
+    for i in range(1, k):
+        p *= flat / i
+        total += p
+        cdf[i] = total
+    cdf[-1] = np.inf
+    head = int(np.searchsorted(cdf.mean(axis=1), 0.995)) + 1
+
+    def draw():
+        u = rng.random(flat.size, dtype=np.float32)
+        demand = (u > cdf[0]).view(np.uint8).copy()
+        for i in range(1, head):
+            demand += (u > cdf[i]).view(np.uint8)
+        rest = np.flatnonzero(u > cdf[head - 1])
+        if len(rest):
+            demand[rest] += (u[rest] > cdf[head:, rest]).sum(axis=0, dtype=np.uint8)
+        return demand
+
+    return draw
+
+
+def _project_block(
+    daily_demand, n_batches, batch_bags, last_bags, reorder_bags, breakeven_units,
+    n_scenarios, days, roast_interval_days, shelf_life_days, demand_factor, seed,
+):
+    rng = np.random.default_rng(seed)
+    n_beans = len(daily_demand)
+    lam = np.asarray(daily_demand)[:, None] * np.clip(sample(rng, demand_factor, (n_beans, n_scenarios)), 0, None)
+    draw_demand = _poisson_sampler(rng, lam)
+    # One flat cell per (bean, scenario); per-bean inputs are repeated so
+    # every daily step is a plain in-place op on equal-length int32 arrays
+    cell = lambda a: np.repeat(np.asarray(a, dtype=np.int32), n_scenarios)
+    n_batches, batch_bags, reorder_bags, breakeven_units = (
+        cell(n_batches), cell(batch_bags), cell(reorder_bags), cell(breakeven_units)
+    )
+    last_shortfall = batch_bags - cell(last_bags)
+    divisor = np.maximum(batch_bags, 1)
+
+    zeros = lambda: np.zeros(n_beans * n_scenarios, dtype=np.int32)
+    roasted, gone, sold, written_off, demanded = zeros(), zeros(), zeros(), zeros(), zeros()
+    batches, stockout_days, unpaid_days = zeros(), zeros(), zeros()
+    on_hand, sell, flag = zeros(), zeros(), np.zeros(n_beans * n_scenarios, dtype=bool)
+    weeks = days // 7
+    weekly_sold = np.empty((n_beans, weeks))
+    # roasted_at[d % shelf_life] holds `roasted` as of the end of day d
+    roasted_at = np.zeros((shelf_life_days, len(roasted)), dtype=np.int32) if shelf_life_days < days else None
+
+    for day in range(days):
+        slot = day % shelf_life_days
+        if roasted_at is not None and day >= shelf_life_days:
+            # Everything roasted up to day - shelf_life that has not gone yet is stale
+            stale = np.subtract(roasted_at[slot], gone, out=roasted_at[slot])
+            np.maximum(stale, np.int32(0), out=stale)
+            written_off += stale
+            gone += stale
+
+        if day % roast_interval_days == 0:
+            np.subtract(roasted, gone, out=on_hand)
+            need = -(-np.maximum(reorder_bags - on_hand, 0) // divisor)
+            count = np.minimum(need, n_batches - batches)
+            bags = count * batch_bags - np.where((count > 0) & (batches + count == n_batches), last_shortfall, 0)
+            roasted += bags
+            batches += count
+
+        demand = draw_demand().astype(np.int32)
+        np.subtract(roasted, gone, out=on_hand)
+        np.minimum(demand, on_hand, out=sell)
+        sold += sell
+        gone += sell
+        demanded += demand
+        stockout_days += np.greater(demand, on_hand, out=flag)
+        unpaid_days += np.less(sold, breakeven_units, out=flag)
+
+        if roasted_at is not None:
+            roasted_at[slot] = roasted
+        if day % 7 == 6 and day // 7 < weeks:
+            weekly_sold[:, day // 7] = sold.reshape(n_beans, n_scenarios).mean(axis=1)
+
+    grid = lambda a: a.reshape(n_beans, n_scenarios)
+    return {
+        "sold": grid(sold),
+        "written_off": grid(written_off),
+        "lost": grid(demanded - sold),
+        "stockout_days": grid(stockout_days),
+        "batches": grid(batches),
+        "stock_left": grid(roasted - gone),
+        "payback_day": grid(np.where(unpaid_days < days, unpaid_days, BREAKEVEN_SENTINEL)),
+        "weekly_sold": weekly_sold,
+    }
+
+
+def project(
+    lots,
+    daily_demand=None,
+    days=DEFAULT_DAYS,
+    roast_batch_kg=DEFAULT_ROAST_BATCH_KG,
+    roast_interval_days=DEFAULT_ROAST_INTERVAL_DAYS,
+    shelf_life_days=DEFAULT_SHELF_LIFE_DAYS,
+    reorder_bags=None,
+    n_scenarios=100,
+    demand_factor=DEFAULT_DEMAND_FACTOR_DIST,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    loss_rate=LOSS_RATE,
+    percentiles=DEFAULT_PERCENTILES,
+    seed=0,
+    max_elements=DEFAULT_MAX_ELEMENTS,
+):
+    """
+    Day-by-day cash flow per bean over `days`, across `n_scenarios`.
+
+    `lots` is a lot frame with purchase_price, purchase_weight_kg and the
+    two target rates; `daily_demand` (bags per day, scalar or one value per
+    lot) defaults to its `daily_demand` column. `roast_batch_kg` may also be
+    per lot. On every `roast_interval_days`-th day, beans with fewer than
+    `reorder_bags` fresh bags (default: the expected demand until the next
+    roast day) are roasted in as many batches as needed to reach it.
+
+    Returns `(summary, weekly_cash)`: `summary` is indexed like `lots` with
+    SUMMARY_COLUMNS plus cash_pXX / payback_day_pXX percentiles over the
+    scenarios (cash = revenue to date - purchase price; payback day is the
+    first day it is >= 0, BREAKEVEN_SENTINEL if never). `weekly_cash` holds
+    the mean cumulative cash at the end of every week, one column per week.
+    """
+    lots = to_frame(lots)
+    if daily_demand is None:
+        if "daily_demand" not in lots:
+            raise ValueError("daily_demand is required (argument or column)")
+        daily_demand = lots["daily_demand"]
+    if days < 1 or roast_interval_days < 1 or shelf_life_days < 1:
+        raise ValueError("days, roast_interval_days and shelf_life_days must be >= 1")
+    if np.any(np.asarray(daily_demand, dtype=np.float64) < 0):
+        raise ValueError("daily_demand must be >= 0")
+    n = len(lots)
+    cols = {
+        c: lots[c].to_numpy(dtype=np.float64)
+        for c in ("purchase_price", "purchase_weight_kg", "target_rate_retail", "target_rate_wholesale")
+    }
+    priced = price_arrays(
+        cols["purchase_price"], cols["purchase_weight_kg"],
+        cols["target_rate_retail"], cols["target_rate_wholesale"],
+        sales_unit_g=sales_unit_g, fee_rate=fee_rate, loss_rate=loss_rate,
+    )
+    valid = priced["valid"]
+    revenue_per_bag = np.where(valid, priced["revenue_per_bag"], 0.0)
+
+    demand = np.broadcast_to(np.asarray(daily_demand, dtype=np.float64), (n,))
+    green_g = np.round(cols["purchase_weight_kg"] * 1000)
+    batch_g = np.broadcast_to(np.round(np.asarray(roast_batch_kg, dtype=np.float64) * 1000), (n,))
+    n_batches, batch_bags, last_bags = _roast_plan(green_g, batch_g, loss_rate, sales_unit_g)
+    n_batches = np.where(valid, n_batches, 0)
+    if reorder_bags is None:
+        reorder_bags = np.ceil(demand * roast_interval_days)
+    reorder_bags = np.broadcast_to(np.asarray(reorder_bags), (n,)).astype(np.int32)
+    breakeven_units = np.where(valid & (revenue_per_bag > 0), priced["breakeven_units"], np.iinfo(np.int32).max)
+
+    block = max(1, max_elements // n_scenarios)
+    seeds = np.random.SeedSequence(seed).spawn(max(1, -(-n // block)))
+    parts = []
+    for i, start in enumerate(range(0, n, block)):
+        rows = slice(start, min(start + block, n))
+        parts.append(_project_block(
+            demand[rows], n_batches[rows], batch_bags[rows], last_bags[rows], reorder_bags[rows],
+            breakeven_units[rows].astype(np.int32), n_scenarios, days, roast_interval_days,
+            shelf_life_days, demand_factor, seeds[i],
+        ))
+
+    columns = list(SUMMARY_COLUMNS)
+    for q in percentiles:
+        columns += [f"cash_p{q:g}", f"payback_day_p{q:g}"]
+    weeks = pd.RangeIndex(1, days // 7 + 1, name="week")
+    if not parts:
+        return (
+            pd.DataFrame(columns=columns, index=lots.index, dtype=np.float64),
+            pd.DataFrame(columns=weeks, index=lots.index, dtype=np.float64),
+        )
+
+    stack = lambda key: np.concatenate([p[key] for p in parts])
+    price = cols["purchase_price"][:, None]
+    cash = stack("sold") * revenue_per_bag[:, None] - price
+    batches = stack("batches")
+    written_off = stack("written_off").mean(axis=1)
+    roasted_green_g = np.minimum(batches * batch_g[:, None], green_g[:, None])
+
+    summary = {
+        "cash_mean": cash.mean(axis=1),
+        "loss_probability": (cash < 0).mean(axis=1),
+        "sold_mean": stack("sold").mean(axis=1),
+        "written_off_mean": written_off,
+        "written_off_cost_mean": written_off * priced["cost_per_bag"],
+        "lost_sales_mean": stack("lost").mean(axis=1),
+        "stockout_days_mean": stack("stockout_days").mean(axis=1),
+        "roasts_mean": batches.mean(axis=1),
+        "stock_left_mean": stack("stock_left").mean(axis=1),
+        "green_left_kg_mean": (green_g[:, None] - roasted_green_g).mean(axis=1) / 1000,
+    }
+    cash_q = np.percentile(cash, percentiles, axis=1)
+    payback_q = np.percentile(stack("payback_day"), percentiles, axis=1)
+    for i, q in enumerate(percentiles):
+        summary[f"cash_p{q:g}"] = cash_q[i]
+        summary[f"payback_day_p{q:g}"] = payback_q[i]
+
+    weekly_cash = pd.DataFrame(stack("weekly_sold") * revenue_per_bag[:, None] - price, index=lots.index, columns=weeks)
+    return pd.DataFrame(summary, index=lots.index, columns=columns), weekly_cash
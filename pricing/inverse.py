@@ -0,0 +1,216 @@
+"""
+Inverse pricing: the cost rate or bag size that reaches a target.
+
+Instead of nudging the 目標原価率 slider until profit or breakeven looks
+right, `solve_targets` returns for every bean of a catalog the highest
+target cost rate (i.e. the cheapest shelf price) or the smallest sales
+unit that still meets the target. The 10-yen ceiling makes these functions step-shaped, so
+candidates are checked with the forward rules (`price_arrays`) themselves:
+
+* Profit, ROI and breakeven are monotone in the cost rate, so every bean
+  is bisected on the rate grid at once — log2(grid size) vectorized
+  passes over the catalog.
+* Breakeven is monotone in the sales unit as long as at least one bag can
+  be sold, so it is bisected the same way.
+* Profit is not monotone in the sales unit (the rounding surplus per bag
+  is spread over fewer bags), so all bag sizes are evaluated as one
+  (beans × sizes) broadcast.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .engine import (
+    DEFAULT_PLATFORM_FEE_RATE,
+    DEFAULT_SALES_UNIT_G,
+    LOSS_RATE,
+    active_mask,
+    price_arrays,
+    to_lot_frame,
+)
+
+TARGET_PROFIT = "profit"              # expected profit per bean (JPY)
+TARGET_ROI = "roi"                    # expected profit / purchase price per bean (%)
+TARGET_BREAKEVEN = "breakeven"        # max breakeven bag count per bean
+TARGET_TOTAL_PROFIT = "total_profit"  # catalog total (JPY) with one common cost rate
+
+SOLVE_RATE = "target_rate_retail"
+SOLVE_SALES_UNIT = "sales_unit_g"
+
+# Same ranges as the input widgets in app.py
+RATE_GRID = (10, 80, 1)          # min, max, step (%)
+SALES_UNIT_GRID = (10, 500, 10)  # min, max, step (g)
+
+DEFAULT_CHUNK_SIZE = 20_000  # beans per (beans × sizes) block
+
+INVERSE_COLUMNS = [
+    "found",
+    "target_rate_retail",
+    "sales_unit_g",
+    "retail_price",
+    "units",
+    "profit",
+    "expected_profit",
+    "breakeven_units",
+    "roi",
+]
+
+
+def _grid(bounds):
+    low, high, step = bounds
+    return low + step * np.arange(int(round((high - low) / step)) + 1)
+
+
+def _meets(priced, purchase_price, target, value):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if target == TARGET_PROFIT:
+            ok = priced["expected_profit"] >= value
+        elif target == TARGET_ROI:
+            ok = priced["expected_profit"] / purchase_price * 100 >= value
+        else:
+            ok = priced["breakeven_units"] <= value
+    return priced["valid"] & ok
+
+
+def _bisect(meets, low, high):
+    """
+    Per-bean bisection on grid indices: `meets(k)` must be True up to some
+    index and False after it, inside [low, high). Returns the last True
+    index, or low - 1 where there is none.
+    """
+    lo = np.asarray(low) - 1
+    hi = np.asarray(high).copy()
+    while True:
+        active = hi - lo > 1
+        if not active.any():
+            return lo
+        mid = np.where(active, (lo + hi) // 2, np.maximum(lo, 0))
+        ok = meets(mid) & active
+        lo = np.where(ok, mid, lo)
+        hi = np.where(active & ~ok, mid, hi)
+
+
+def solve_targets(
+    lots,
+    target,
+    value,
+    solve_for=SOLVE_RATE,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    loss_rate=LOSS_RATE,
+    rate_grid=RATE_GRID,
+    sales_unit_grid=SALES_UNIT_GRID,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """
+    Required retail cost rate or sales unit for every active bean.
+
+    `target` is one of TARGET_PROFIT / TARGET_ROI / TARGET_BREAKEVEN (per
+    bean; `value` may be a scalar or one value per lot) or
+    TARGET_TOTAL_PROFIT (a single common cost rate for the whole catalog).
+    With `solve_for=SOLVE_RATE` the answer is the highest rate on
+    `rate_grid` that meets the target; with SOLVE_SALES_UNIT it is the
+    smallest bag size on `sales_unit_grid`, keeping each lot's own rate.
+
+    Returns a frame indexed like the active lots with INVERSE_COLUMNS
+    evaluated at the answer; `found` is False where no grid value works.
+    """
+    if target not in (TARGET_PROFIT, TARGET_ROI, TARGET_BREAKEVEN, TARGET_TOTAL_PROFIT):
+        raise ValueError(f"unknown target: {target}")
+    if solve_for not in (SOLVE_RATE, SOLVE_SALES_UNIT):
+        raise ValueError(f"unknown solve_for: {solve_for}")
+    if target == TARGET_TOTAL_PROFIT and solve_for != SOLVE_RATE:
+        raise ValueError("total_profit can only be solved for target_rate_retail")
+
+    lots = to_lot_frame(lots)
+    mask = active_mask(lots)
+    lots = lots[mask]
+    n = len(lots)
+    price = lots["purchase_price"].to_numpy()
+    weight = lots["purchase_weight_kg"].to_numpy(dtype=np.float64)
+    rate_retail = lots["target_rate_retail"].to_numpy(dtype=np.float64)
+    rate_wholesale = lots["target_rate_wholesale"].to_numpy(dtype=np.float64)
+    if target != TARGET_TOTAL_PROFIT:
+        value = np.asarray(value, dtype=np.float64)
+        if value.ndim:
+            value = value[mask]
+
+    def evaluate(rates, units_g):
+        return price_arrays(
+            price, weight, rates, rate_wholesale,
+            sales_unit_g=units_g, fee_rate=fee_rate, loss_rate=loss_rate,
+        )
+
+    if solve_for == SOLVE_RATE:
+        rates = _grid(rate_grid)
+        if target == TARGET_TOTAL_PROFIT:
+            def total_meets(k):
+                priced = evaluate(rates[k], sales_unit_g)
+                profit = priced["expected_profit"][priced["valid"]]
+                total = np.add.accumulate(profit)[-1] if len(profit) else 0.0
+                return np.asarray(total >= value)
+
+            best = _bisect(total_meets, 0, len(rates))
+            best = np.full(n, best)
+        else:
+            best = _bisect(
+                lambda k: _meets(evaluate(rates[k], sales_unit_g), price, target, value),
+                np.zeros(n, dtype=np.int64),
+                np.full(n, len(rates)),
+            )
+        found = best >= 0
+        rate_answer = np.where(found, rates[np.maximum(best, 0)], np.nan)
+        unit_answer = np.full(n, float(sales_unit_g))
+        priced = evaluate(np.where(found, rate_answer, rate_retail), sales_unit_g)
+    else:
+        sizes = _grid(sales_unit_grid)
+        roasted_g = weight * 1000 * (1 - loss_rate)
+        if target == TARGET_BREAKEVEN:
+            # Sizes above the roasted weight sell nothing; below it breakeven
+            # only falls as the bag (and its price) grows
+            sellable = np.searchsorted(sizes, roasted_g, side="right")
+            largest_failing = _bisect(
+                lambda k: ~_meets(evaluate(rate_retail, sizes[k]), price, target, value),
+                np.zeros(n, dtype=np.int64),
+                sellable,
+            )
+            best = np.where(largest_failing + 1 < sellable, largest_failing + 1, -1)
+        else:
+            best = np.full(n, -1)
+            for start in range(0, n, chunk_size):
+                rows = slice(start, min(start + chunk_size, n))
+                value_rows = value[rows] if value.ndim else value
+                priced = price_arrays(
+                    price[rows][:, None], weight[rows][:, None], rate_retail[rows][:, None],
+                    rate_wholesale[rows][:, None], sales_unit_g=sizes[None, :],
+                    fee_rate=fee_rate, loss_rate=loss_rate,
+                )
+                ok = _meets(
+                    priced, price[rows][:, None], target,
+                    value_rows[:, None] if np.ndim(value_rows) else value_rows,
+                )
+                best[rows] = np.where(ok.any(axis=1), np.argmax(ok, axis=1), -1)
+        found = best >= 0
+        rate_answer = rate_retail.copy()
+        unit_answer = np.where(found, sizes[np.maximum(best, 0)], np.nan)
+        priced = evaluate(rate_retail, np.where(found, unit_answer, sales_unit_g))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi = priced["expected_profit"] / price * 100
+    found &= priced["valid"]
+    pick = lambda a: np.where(found, a, np.nan)
+    return pd.DataFrame(
+        {
+            "found": found,
+            "target_rate_retail": pick(rate_answer),
+            "sales_unit_g": pick(unit_answer),
+            "retail_price": pick(priced["retail_price"]),
+            "units": pick(priced["units"]),
+            "profit": pick(np.trunc(priced["expected_profit"])),
+            "expected_profit": pick(priced["expected_profit"]),
+            "breakeven_units": pick(priced["breakeven_units"]),
+            "roi": pick(roi),
+        },
+        index=lots.index,
+        columns=INVERSE_COLUMNS,
+    )
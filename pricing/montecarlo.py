@@ -0,0 +1,167 @@
+"""
+Monte Carlo sensitivity of profit and breakeven to roast loss, fee rate and
+purchase price.
+
+Scenarios are drawn per bean and pushed through `price_arrays` as a
+(beans × scenarios) broadcast. Work is split into bean blocks whose size is
+chosen from a fixed element budget, and scenarios inside a block are
+generated chunk by chunk. The percentiles are exact, so a block keeps every
+scenario's profit and breakeven: memory per block is about
+16 bytes × max(max_elements, n_scenarios), which is why n_scenarios is
+capped at MAX_SCENARIOS. Blocks can be fanned out over a process pool (each
+worker holds one block); every block has its own seed, so results do not
+depend on the number of workers.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .engine import BREAKEVEN_SENTINEL, DEFAULT_PLATFORM_FEE_RATE, DEFAULT_SALES_UNIT_G, price_arrays, to_frame
+
+# Distribution specs: a constant, or a tuple (kind, *params)
+#   ("uniform", low, high) / ("normal", mean, sd) / ("triangular", low, mode, high)
+DEFAULT_LOSS_RATE_DIST = ("uniform", 0.12, 0.22)
+DEFAULT_FEE_RATE_DIST = DEFAULT_PLATFORM_FEE_RATE
+DEFAULT_PRICE_FACTOR_DIST = ("normal", 1.0, 0.05)  # multiplier on purchase_price
+
+DEFAULT_PERCENTILES = (5, 50, 95)
+DEFAULT_MAX_ELEMENTS = 1_000_000  # beans × scenarios evaluated per step
+MAX_SCENARIOS = 1_000_000         # per bean; one block holds all of them (~16 MB)
+PARALLEL_THRESHOLD = 50_000_000   # total beans × scenarios before a process pool pays off
+
+
+def sample(rng, spec, shape):
+    """Draws `shape` values from a distribution spec (see module constants)."""
+    if not isinstance(spec, tuple):
+        return np.full(shape, float(spec))
+    kind, *params = spec
+    if kind == "uniform":
+        return rng.uniform(params[0], params[1], shape)
+    if kind == "normal":
+        return rng.normal(params[0], params[1], shape)
+    if kind == "triangular":
+        return rng.triangular(params[0], params[1], params[2], shape)
+    raise ValueError(f"unknown distribution: {kind}")
+
+
+def _simulate_block(
+    purchase_price, purchase_weight_kg, target_rate_retail, target_rate_wholesale,
+    retail_price, n_scenarios, sales_unit_g, loss_dist, fee_dist, price_dist,
+    percentiles, chunk, seed,
+):
+    rng = np.random.default_rng(seed)
+    n_beans = len(purchase_price)
+    profit = np.empty((n_beans, n_scenarios))
+    breakeven = np.empty((n_beans, n_scenarios))
+
+    col = lambda a: np.asarray(a)[:, None]
+    for start in range(0, n_scenarios, chunk):
+        shape = (n_beans, min(chunk, n_scenarios - start))
+        price = col(purchase_price) * np.clip(sample(rng, price_dist, shape), 0, None)
+        priced = price_arrays(
+            price,
+            col(purchase_weight_kg),
+            col(target_rate_retail),
+            col(target_rate_wholesale),
+            sales_unit_g=sales_unit_g,
+            fee_rate=np.clip(sample(rng, fee_dist, shape), 0, 1),
+            loss_rate=np.clip(sample(rng, loss_dist, shape), 0, 1),
+            retail_price=None if retail_price is None else col(retail_price),
+        )
+        # Nothing sellable: the whole purchase is lost
+        stop = start + shape[1]
+        profit[:, start:stop] = np.where(priced["valid"], priced["expected_profit"], -price)
+        breakeven[:, start:stop] = np.where(priced["valid"], priced["breakeven_units"], BREAKEVEN_SENTINEL)
+
+    out = {
+        "profit_mean": profit.mean(axis=1),
+        "loss_probability": (profit < 0).mean(axis=1),
+    }
+    profit_q = np.percentile(profit, percentiles, axis=1)
+    breakeven_q = np.percentile(breakeven, percentiles, axis=1)
+    for i, q in enumerate(percentiles):
+        out[f"profit_p{q:g}"] = profit_q[i]
+        out[f"breakeven_p{q:g}"] = breakeven_q[i]
+    return out
+
+
+def simulate(
+    lots,
+    n_scenarios=10_000,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    loss_rate=DEFAULT_LOSS_RATE_DIST,
+    fee_rate=DEFAULT_FEE_RATE_DIST,
+    price_factor=DEFAULT_PRICE_FACTOR_DIST,
+    reprice=False,
+    percentiles=DEFAULT_PERCENTILES,
+    seed=0,
+    workers=None,
+    max_elements=DEFAULT_MAX_ELEMENTS,
+):
+    """
+    Profit / breakeven percentiles per bean over `n_scenarios` draws.
+
+    `lots` is a lot frame (e.g. `price_lots` output or the store's frames)
+    with purchase_price, purchase_weight_kg and the two target rates. With
+    `reprice=False` the shelf price stays at its nominal value (computed at
+    the default LOSS_RATE / fee) and only the outcomes vary; `reprice=True`
+    re-derives the price in every scenario from the target cost rate.
+
+    Returns a frame indexed like `lots` with profit_mean, loss_probability
+    and profit_pXX / breakeven_pXX columns. Raises ValueError for more than
+    MAX_SCENARIOS scenarios.
+    """
+    if not 1 <= n_scenarios <= MAX_SCENARIOS:
+        raise ValueError(f"n_scenarios must be between 1 and {MAX_SCENARIOS:,}")
+    lots = to_frame(lots)
+    cols = {
+        c: lots[c].to_numpy(dtype=np.float64)
+        for c in ("purchase_price", "purchase_weight_kg", "target_rate_retail", "target_rate_wholesale")
+    }
+    if reprice:
+        retail = None
+    else:
+        nominal = price_arrays(
+            cols["purchase_price"], cols["purchase_weight_kg"],
+            cols["target_rate_retail"], cols["target_rate_wholesale"],
+            sales_unit_g=sales_unit_g, fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+        )
+        retail = nominal["retail_price"].astype(np.float64)
+
+    n = len(lots)
+    chunk = max(1, min(n_scenarios, max_elements))
+    block = max(1, max_elements // n_scenarios)
+    seeds = np.random.SeedSequence(seed).spawn(max(1, -(-n // block)))
+
+    args = []
+    for i, start in enumerate(range(0, n, block)):
+        stop = min(start + block, n)
+        args.append((
+            cols["purchase_price"][start:stop], cols["purchase_weight_kg"][start:stop],
+            cols["target_rate_retail"][start:stop], cols["target_rate_wholesale"][start:stop],
+            None if retail is None else retail[start:stop],
+            n_scenarios, sales_unit_g, loss_rate, fee_rate, price_factor,
+            tuple(percentiles), chunk, seeds[i],
+        ))
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if n * n_scenarios >= PARALLEL_THRESHOLD else 1
+    if workers > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_block, *zip(*args)))
+    else:
+        parts = [_simulate_block(*a) for a in args]
+
+    columns = ["profit_mean", "loss_probability"]
+    for q in percentiles:
+        columns += [f"profit_p{q:g}", f"breakeven_p{q:g}"]
+    if not parts:
+        return pd.DataFrame(columns=columns, index=lots.index, dtype=np.float64)
+    return pd.DataFrame(
+        {c: np.concatenate([p[c] for p in parts]) for c in columns},
+        index=lots.index,
+        columns=columns,
+    )
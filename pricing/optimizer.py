@@ -0,0 +1,136 @@
+"""
+Portfolio-wide big-bag / discount optimizer.
+
+For every bean, searches the full (bag size × discount) space of the
+割引・大袋シミュレーター and returns the setting that earns the most while
+staying in the "Safe" band (profit >= 0 and cost rate <= the bean's
+wholesale target). Beans are evaluated as a 3-D broadcast grid in chunks,
+and large catalogs are fanned out over a process pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .discount import DEFAULT_BAG_SIZES, MAX_DISCOUNT_PERCENT, bag_metrics, discount_steps, is_safe
+from .engine import DEFAULT_PLATFORM_FEE_RATE, DEFAULT_SALES_UNIT_G
+
+OBJECTIVE_PROFIT = "profit"      # total profit of the lot sold in big bags
+OBJECTIVE_DISCOUNT = "discount"  # deepest discount that is still Safe
+
+DEFAULT_CHUNK_SIZE = 2_000
+PARALLEL_THRESHOLD = 20_000  # below this a process pool costs more than it saves
+
+OPTIMIZER_COLUMNS = [
+    "found",
+    "best_bag_g",
+    "best_discount_percent",
+    "final_price",
+    "profit_per_bag",
+    "cost_rate",
+    "big_bags",
+    "total_profit",
+]
+
+
+def _optimize_chunk(retail_price, cost_per_bag, units, target_rate_wholesale, sales_unit_g, fee_rate, bag_sizes, discounts, objective):
+    bags = np.asarray(bag_sizes, dtype=np.float64)
+    n_bags, n_discounts = len(bags), len(discounts)
+
+    # beans × bags × discounts
+    metrics = bag_metrics(
+        retail_price[:, None, None],
+        cost_per_bag[:, None, None],
+        sales_unit_g,
+        bags[None, :, None],
+        discounts[None, None, :],
+        fee_rate,
+    )
+    safe = is_safe(metrics["profit"], metrics["cost_rate"], target_rate_wholesale[:, None, None])
+
+    big_bags = np.floor(units[:, None, None] * sales_unit_g / bags[None, :, None])
+    total_profit = metrics["profit"] * big_bags
+    safe &= big_bags > 0
+
+    if objective == OBJECTIVE_DISCOUNT:
+        # Deepest Safe discount first, then the most profitable bag size at it
+        safe_by_discount = safe.any(axis=1)
+        deepest = n_discounts - 1 - np.argmax(safe_by_discount[:, ::-1], axis=1)
+        safe &= np.arange(n_discounts)[None, None, :] == deepest[:, None, None]
+
+    score = np.where(safe, total_profit, -np.inf).reshape(len(retail_price), n_bags * n_discounts)
+
+    best = np.argmax(score, axis=1)
+    found = np.isfinite(score[np.arange(len(best)), best])
+    bag_idx, discount_idx = np.divmod(best, n_discounts)
+    rows = np.arange(len(best))
+
+    def pick(grid):
+        grid = np.broadcast_to(grid, safe.shape)
+        return np.where(found, grid[rows, bag_idx, discount_idx], np.nan)
+
+    return {
+        "found": found,
+        "best_bag_g": np.where(found, bags[bag_idx], np.nan),
+        "best_discount_percent": np.where(found, discounts[discount_idx], np.nan),
+        "final_price": pick(metrics["final_price"]),
+        "profit_per_bag": pick(metrics["profit"]),
+        "cost_rate": pick(metrics["cost_rate"]),
+        "big_bags": pick(big_bags),
+        "total_profit": pick(total_profit),
+    }
+
+
+def optimize_discounts(
+    results,
+    sales_unit_g=DEFAULT_SALES_UNIT_G,
+    fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+    bag_sizes=DEFAULT_BAG_SIZES,
+    step_percent=1,
+    max_percent=MAX_DISCOUNT_PERCENT,
+    objective=OBJECTIVE_PROFIT,
+    workers=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """
+    Best Safe big-bag setting for every priced bean.
+
+    `results` is a `price_lots` frame (retail_price, cost_per_bag, units,
+    target_rate_wholesale). Returns a frame with the same index and the
+    OPTIMIZER_COLUMNS; `found` is False for beans that have no Safe setting.
+    `workers=None` uses all cores for catalogs above PARALLEL_THRESHOLD;
+    `workers=1` always runs in-process.
+    """
+    if objective not in (OBJECTIVE_PROFIT, OBJECTIVE_DISCOUNT):
+        raise ValueError(f"unknown objective: {objective}")
+
+    columns = [
+        results[col].to_numpy(dtype=np.float64)
+        for col in ("retail_price", "cost_per_bag", "units", "target_rate_wholesale")
+    ]
+    discounts = discount_steps(max_percent, step_percent)
+    bag_sizes = tuple(bag_sizes)
+    n = len(results)
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if n >= PARALLEL_THRESHOLD else 1
+
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    args = [
+        [col[start:stop] for col in columns] + [sales_unit_g, fee_rate, bag_sizes, discounts, objective]
+        for start, stop in bounds
+    ]
+
+    if workers > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_optimize_chunk, *zip(*args)))
+    else:
+        parts = [_optimize_chunk(*a) for a in args]
+
+    if parts:
+        merged = {col: np.concatenate([p[col] for p in parts]) for col in OPTIMIZER_COLUMNS}
+    else:
+        merged = {col: np.array([], dtype=bool if col == "found" else np.float64) for col in OPTIMIZER_COLUMNS}
+    return pd.DataFrame(merged, index=results.index, columns=OPTIMIZER_COLUMNS)
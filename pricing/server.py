@@ -0,0 +1,289 @@
+"""
+Local HTTP pricing service (ASGI).
+
+    pip install uvicorn
+    python -m pricing.server --port 8000 --workers 4
+
+Endpoints:
+    POST /price   Batch of lots as JSON (`{"lots": [...], "sales_unit_g": 100,
+                  "fee_rate": 0.1}` or a bare list) or NDJSON (one lot per
+                  line, Content-Type: application/x-ndjson, parameters in the
+                  query string). Results come back in the same format and
+                  order; lots that cannot be priced get `"priced": false`.
+                  A body that is not a list or an object, or parameters
+                  out of range (fee_rate and loss_rate must be in [0, 1)),
+                  get a 400.
+    GET  /stats   p50/p99 latency, throughput and cache counters.
+    GET  /health  Liveness check.
+
+Identical lot inputs are answered from an LRU cache; large batches of
+cache misses are priced with `price_lots` in a process pool so the event
+loop stays responsive.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs
+
+import numpy as np
+import pandas as pd
+
+from .engine import DEFAULT_PLATFORM_FEE_RATE, DEFAULT_SALES_UNIT_G, LOSS_RATE, LOT_COLUMNS, RESULT_COLUMNS, price_lots
+
+DEFAULT_CACHE_SIZE = 200_000
+POOL_THRESHOLD = 5_000  # cache misses per request before using the process pool
+LATENCY_WINDOW = 10_000
+MAX_BODY_BYTES = 256 * 1024 * 1024
+
+NDJSON = "application/x-ndjson"
+NUMERIC_COLUMNS = LOT_COLUMNS[1:]
+
+
+def _lot_fields(lot):
+    """
+    The LOT_COLUMNS of a request lot as hashable scalars (the cache key).
+    Numbers and strings are kept (strings are parsed when pricing); any
+    other value becomes None, so the lot is reported as not priced.
+    """
+    name = lot.get("name")
+    fields = {"name": str(name) if isinstance(name, (str, int, float)) and not isinstance(name, bool) else ""}
+    for col in NUMERIC_COLUMNS:
+        value = lot.get(col)
+        ok = isinstance(value, (str, int, float)) and not isinstance(value, bool)
+        fields[col] = value if ok else None
+    return fields
+
+
+def _price_records(lots, sales_unit_g, fee_rate, loss_rate):
+    """Prices a list of lot dicts; returns one result dict (or None) per lot."""
+    frame = pd.DataFrame(lots, columns=LOT_COLUMNS)
+    for col in NUMERIC_COLUMNS:
+        # Non-numeric inputs become NaN, which the active filter drops
+        frame[col] = pd.to_numeric(frame[col], errors="coerce")
+    priced = price_lots(frame, sales_unit_g, fee_rate, loss_rate)
+    out = [None] * len(lots)
+    for pos, row in zip(priced.index, priced[RESULT_COLUMNS].to_dict("records")):
+        out[pos] = row
+    return out
+
+
+class PricingService:
+    """State shared by all requests: result cache, process pool and metrics."""
+
+    def __init__(self, workers=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pool = None
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self.lots = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._latency_ms = deque(maxlen=LATENCY_WINDOW)
+        self._recent = deque()  # (finished_at, lots) over the last minute
+
+    def start(self):
+        if self.workers > 1 and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def price(self, lots, sales_unit_g, fee_rate, loss_rate):
+        params = (sales_unit_g, fee_rate, loss_rate)
+        keys = [tuple(lot.get(col) for col in LOT_COLUMNS) + params for lot in lots]
+
+        results = [None] * len(lots)
+        missing = {}
+        for pos, key in enumerate(keys):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                results[pos] = self._cache[key]
+                self.hits += 1
+            else:
+                missing.setdefault(key, []).append(pos)
+        self.misses += len(missing)
+
+        if missing:
+            todo = [lots[positions[0]] for positions in missing.values()]
+            if self._pool is not None and len(todo) >= POOL_THRESHOLD:
+                chunk = -(-len(todo) // self.workers)
+                loop = asyncio.get_running_loop()
+                parts = await asyncio.gather(*(
+                    loop.run_in_executor(self._pool, _price_records, todo[i:i + chunk], *params)
+                    for i in range(0, len(todo), chunk)
+                ))
+                priced = [row for part in parts for row in part]
+            else:
+                priced = _price_records(todo, *params)
+
+            for (key, positions), row in zip(missing.items(), priced):
+                entry = {"priced": False} if row is None else {**row, "priced": True}
+                self._cache[key] = entry
+                for pos in positions:
+                    results[pos] = entry
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return results
+
+    def record(self, started_at, n_lots):
+        now = time.perf_counter()
+        self.requests += 1
+        self.lots += n_lots
+        self._latency_ms.append((now - started_at) * 1000)
+        self._recent.append((now, n_lots))
+        while self._recent and self._recent[0][0] < now - 60:
+            self._recent.popleft()
+
+    def stats(self):
+        now = time.perf_counter()
+        latency = np.asarray(self._latency_ms) if self._latency_ms else None
+        window = min(60.0, now - self.started) or 1.0
+        return {
+            "requests": self.requests,
+            "lots": self.lots,
+            "errors": self.errors,
+            "uptime_s": now - self.started,
+            "latency_ms": {
+                "p50": float(np.percentile(latency, 50)) if latency is not None else None,
+                "p99": float(np.percentile(latency, 99)) if latency is not None else None,
+            },
+            "throughput_1m": {
+                "requests_per_sec": len(self._recent) / window,
+                "lots_per_sec": sum(n for _, n in self._recent) / window,
+            },
+            "cache": {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)},
+            "workers": self.workers,
+        }
+
+
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        body = message.get("body", b"")
+        size += len(body)
+        if size > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        chunks.append(body)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _respond(send, status, payload, content_type="application/json"):
+    if isinstance(payload, (dict, list)):
+        payload = json.dumps(payload, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode() + b"; charset=utf-8")],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+def _param(source, name, default, cast):
+    value = source.get(name, default)
+    if isinstance(value, list) and len(value) == 1:  # query string values
+        value = value[0]
+    return cast(value)
+
+
+def create_app(service=None):
+    """Builds the ASGI application around a PricingService."""
+    service = service or PricingService()
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    service.start()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    service.shutdown()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        if method == "GET" and path == "/health":
+            return await _respond(send, 200, {"status": "ok"})
+        if method == "GET" and path == "/stats":
+            return await _respond(send, 200, service.stats())
+        if path != "/price":
+            return await _respond(send, 404, {"error": "not found"})
+        if method != "POST":
+            return await _respond(send, 405, {"error": "method not allowed"})
+
+        started_at = time.perf_counter()
+        headers = dict(scope.get("headers") or [])
+        is_ndjson = NDJSON.encode() in headers.get(b"content-type", b"")
+        query = parse_qs(scope.get("query_string", b"").decode())
+        try:
+            body = await _read_body(receive)
+            if is_ndjson:
+                lots = [json.loads(line) for line in body.splitlines() if line.strip()]
+                options = query
+            else:
+                payload = json.loads(body or b"[]")
+                if not isinstance(payload, (list, dict)):
+                    raise ValueError("body must be a list of lots or an object with a lots list")
+                lots = payload if isinstance(payload, list) else payload.get("lots", [])
+                options = {**query, **(payload if isinstance(payload, dict) else {})}
+            sales_unit_g = _param(options, "sales_unit_g", DEFAULT_SALES_UNIT_G, int)
+            fee_rate = _param(options, "fee_rate", DEFAULT_PLATFORM_FEE_RATE, float)
+            loss_rate = _param(options, "loss_rate", LOSS_RATE, float)
+            if sales_unit_g <= 0:
+                raise ValueError("sales_unit_g must be positive")
+            for name, rate in (("fee_rate", fee_rate), ("loss_rate", loss_rate)):
+                if not 0 <= rate < 1:  # also false for NaN
+                    raise ValueError(f"{name} must be >= 0 and < 1")
+            if not isinstance(lots, list) or not all(isinstance(lot, dict) for lot in lots):
+                raise ValueError("each lot must be a JSON object")
+            lots = [_lot_fields(lot) for lot in lots]
+        except (ValueError, TypeError, OverflowError) as exc:
+            service.errors += 1
+            return await _respond(send, 400, {"error": str(exc)})
+
+        results = await service.price(lots, sales_unit_g, fee_rate, loss_rate)
+        service.record(started_at, len(lots))
+
+        if is_ndjson:
+            body = "\n".join(json.dumps(r, ensure_ascii=False) for r in results).encode()
+            return await _respond(send, 200, body + b"\n" if body else body, NDJSON)
+        return await _respond(send, 200, {"results": results})
+
+    app.service = service
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pricing.server", description="価格計算 HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="価格計算プロセス数 (デフォルト: CPU数)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="キャッシュする入力の件数")
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("サーバーの起動には uvicorn が必要です: pip install uvicorn")
+
+    app = create_app(PricingService(workers=args.workers, cache_size=args.cache_size))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
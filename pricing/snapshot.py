@@ -0,0 +1,109 @@
+"""
+Persisted results snapshots.
+
+The catalog-wide results table is written once as an uncompressed Arrow
+IPC file named after a hash of everything it depends on (catalog identity
+and version, global parameters, snapshot format). Later runs — and every
+other server process — memory-map that file instead of repricing, so the
+OS page cache holds one read-only copy shared by all of them. A new file
+is computed only when the hash changes; older ones are pruned.
+
+Needs `pyarrow`; without it `load_or_compute` just computes the results.
+Bump SNAPSHOT_VERSION whenever the pricing rules or the result columns
+change, so stale snapshots are never read.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+from .compat import optional_pyarrow
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = os.environ.get("COFFEE_SNAPSHOT_DIR", "snapshots")
+KEEP_SNAPSHOTS = 4
+
+
+def snapshot_key(source, sales_unit_g, fee_rate, loss_rate):
+    """
+    Hex digest identifying a results table. `source` identifies the inputs,
+    e.g. `LotStore.catalog_version()` or a content digest of the lots.
+    """
+    payload = json.dumps([SNAPSHOT_VERSION, source, sales_unit_g, fee_rate, loss_rate], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def content_digest(table):
+    """Digest of a ColumnTable's contents, for inputs that do not come from the store."""
+    h = hashlib.blake2b(digest_size=16)
+    for array in (table.names.offsets, table.names.data, table.index, *table.arrays.values()):
+        h.update(array.dtype.str.encode())
+        h.update(memoryview(array).cast("B") if array.flags.c_contiguous else array.tobytes())
+    return h.hexdigest()
+
+
+def snapshot_path(key, directory=DEFAULT_SNAPSHOT_DIR):
+    return os.path.join(directory, f"results-v{SNAPSHOT_VERSION}-{key[:32]}.arrow")
+
+
+def save(table, key, directory=DEFAULT_SNAPSHOT_DIR):
+    """Writes a ResultColumns table atomically and returns its path."""
+    pa = optional_pyarrow("ipc")
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(key, directory)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    arrow_table = table.to_arrow().replace_schema_metadata({
+        "snapshot_version": str(SNAPSHOT_VERSION),
+        "key": key,
+    })
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    os.replace(tmp, path)
+    prune(directory)
+    return path
+
+
+def load(key, table_type, directory=DEFAULT_SNAPSHOT_DIR):
+    """Memory-maps a snapshot as `table_type` (e.g. ResultColumns), or None if absent."""
+    pa = optional_pyarrow("ipc")
+    path = snapshot_path(key, directory)
+    if pa is None or not os.path.exists(path):
+        return None
+    source = pa.memory_map(path, "r")
+    arrow_table = pa.ipc.open_file(source).read_all()
+    metadata = arrow_table.schema.metadata or {}
+    if metadata.get(b"key") != key.encode():
+        return None
+    return table_type.from_arrow(arrow_table)
+
+
+def prune(directory=DEFAULT_SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+    """Deletes all but the `keep` most recent snapshots (open maps stay valid)."""
+    paths = sorted(glob.glob(os.path.join(directory, "results-v*.arrow")), key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load_or_compute(key, compute, table_type, directory=DEFAULT_SNAPSHOT_DIR):
+    """
+    Returns `(table, source)` where source is "snapshot" or "computed".
+    `compute()` runs only when no snapshot matches `key`.
+    """
+    if optional_pyarrow("ipc") is None:
+        return compute(), "computed"
+    table = load(key, table_type, directory)
+    if table is not None:
+        return table, "snapshot"
+    table = compute()
+    try:
+        save(table, key, directory)
+    except OSError:
+        return table, "computed"
+    # Serve the mapped copy so this process shares pages with the others
+    mapped = load(key, table_type, directory)
+    return (table if mapped is None else mapped), "computed"
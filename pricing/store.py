@@ -0,0 +1,239 @@
+"""
+SQLite-backed lot repository.
+
+Replaces the fixed five-slot `bean_store` list: lots are persisted locally,
+indexed by name and origin, and read back one page at a time so the UI and
+the pricing step only touch the lots that are being viewed or edited.
+"""
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .engine import LOT_COLUMNS, to_frame
+
+DEFAULT_DB_PATH = os.environ.get("COFFEE_LOT_DB", "lots.db")
+DEFAULT_PAGE_SIZE = 5
+TARGET_RATE_MIN, TARGET_RATE_MAX = 10, 80  # whole percent, the range of the form sliders
+
+STORE_COLUMNS = ["id", "name", "origin"] + LOT_COLUMNS[1:]
+
+NEW_LOT = {
+    "name": "",
+    "origin": "",
+    "purchase_price": 0,
+    "purchase_weight_kg": 0.0,
+    "target_rate_retail": 30,
+    "target_rate_wholesale": 50,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lots (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    origin TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    purchase_price INTEGER NOT NULL DEFAULT 0,
+    purchase_weight_kg REAL NOT NULL DEFAULT 0,
+    target_rate_retail INTEGER NOT NULL DEFAULT 30,
+    target_rate_wholesale INTEGER NOT NULL DEFAULT 50
+);
+CREATE INDEX IF NOT EXISTS idx_lots_name ON lots(name);
+CREATE INDEX IF NOT EXISTS idx_lots_origin_name ON lots(origin, name);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    catalog_id TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+INSERT INTO catalog_meta (catalog_id, version)
+SELECT lower(hex(randomblob(16))), 0 WHERE NOT EXISTS (SELECT 1 FROM catalog_meta);
+"""
+
+_EDITABLE = set(NEW_LOT)
+RATE_COLUMNS = ["target_rate_retail", "target_rate_wholesale"]
+INTEGER_COLUMNS = ["purchase_price"] + RATE_COLUMNS
+
+PAGE_ORDERS = {
+    "id": "id",           # insertion order: stable while a lot is being edited
+    "name": "name, id",   # search results
+}
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class LotStore:
+    """Thread-safe wrapper around a single SQLite connection."""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Writes ---
+    def _touch(self):
+        # Inside the write transaction: the persistent version also sees other processes' writes
+        self._conn.execute("UPDATE catalog_meta SET version = version + 1")
+
+    def add(self, **fields):
+        lot = {**NEW_LOT, **{k: v for k, v in fields.items() if k in _EDITABLE}}
+        cols = list(NEW_LOT)
+        with self._lock, self._conn:
+            self._touch()
+            cur = self._conn.execute(
+                f"INSERT INTO lots ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                [lot[c] for c in cols],
+            )
+        return cur.lastrowid
+
+    def add_many(self, lots):
+        """
+        Bulk insert from a DataFrame or an iterable of dicts. Rows with a
+        number the form cannot hold (blank or non-numeric, negative, fractional
+        yen or rate, rate outside 10-80 %) are skipped.
+        Returns (added, skipped).
+        """
+        frame = to_frame(lots)
+        cols = list(NEW_LOT)
+        for col in cols:
+            if col not in frame:
+                frame = frame.assign(**{col: NEW_LOT[col]})
+        frame = frame[cols].fillna({"name": "", "origin": ""})
+        numbers = frame[INTEGER_COLUMNS + ["purchase_weight_kg"]].apply(pd.to_numeric, errors="coerce").astype(np.float64)
+        rates = numbers[RATE_COLUMNS]
+        ok = (
+            np.isfinite(numbers).all(axis=1)
+            & (numbers >= 0).all(axis=1)
+            & (numbers[INTEGER_COLUMNS] % 1 == 0).all(axis=1)
+            & ((rates >= TARGET_RATE_MIN) & (rates <= TARGET_RATE_MAX)).all(axis=1)
+        )
+        frame, numbers = frame[ok], numbers[ok]
+        rows = zip(
+            frame["name"].astype(str).tolist(),
+            frame["origin"].astype(str).tolist(),
+            numbers["purchase_price"].astype("int64").tolist(),
+            numbers["purchase_weight_kg"].tolist(),
+            numbers["target_rate_retail"].astype("int64").tolist(),
+            numbers["target_rate_wholesale"].astype("int64").tolist(),
+        )
+        with self._lock, self._conn:
+            self._touch()
+            self._conn.executemany(
+                f"INSERT INTO lots ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                rows,
+            )
+        return len(frame), int((~ok).sum())
+
+    def update(self, lot_id, **fields):
+        fields = {k: v for k, v in fields.items() if k in _EDITABLE}
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._conn:
+            self._touch()
+            self._conn.execute(
+                f"UPDATE lots SET {assignments} WHERE id = ?",
+                [*fields.values(), lot_id],
+            )
+
+    def update_many(self, updates):
+        """Applies {lot_id: {field: value}} in one transaction."""
+        groups = {}
+        for lot_id, fields in updates.items():
+            fields = {k: v for k, v in fields.items() if k in _EDITABLE}
+            if fields:
+                groups.setdefault(tuple(fields), []).append([*fields.values(), lot_id])
+        if not groups:
+            return
+        with self._lock, self._conn:
+            self._touch()
+            for cols, rows in groups.items():
+                assignments = ", ".join(f"{k} = ?" for k in cols)
+                self._conn.executemany(f"UPDATE lots SET {assignments} WHERE id = ?", rows)
+
+    def delete(self, lot_id):
+        with self._lock, self._conn:
+            self._touch()
+            self._conn.execute("DELETE FROM lots WHERE id = ?", (lot_id,))
+
+    # --- Reads ---
+    def catalog_version(self):
+        """(catalog_id, version): changes with every write from any process."""
+        with self._lock:
+            row = self._conn.execute("SELECT catalog_id, version FROM catalog_meta").fetchone()
+        return row[0], row[1]
+
+    def get(self, lot_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(STORE_COLUMNS)} FROM lots WHERE id = ?", (lot_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _where(self, query=None, origin=None):
+        clauses, params = [], []
+        if query:
+            # Prefix match so the NOCASE name index can be used
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(_escape_like(query) + "%")
+        if origin:
+            clauses.append("origin = ?")
+            params.append(origin)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def count(self, query=None, origin=None):
+        where, params = self._where(query, origin)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM lots {where}", params).fetchone()[0]
+
+    def page(self, page=0, page_size=DEFAULT_PAGE_SIZE, query=None, origin=None, order="name"):
+        """Returns one page of lots (ordered by `order`, see PAGE_ORDERS) as a list of dicts."""
+        where, params = self._where(query, origin)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(STORE_COLUMNS)} FROM lots {where} "
+                f"ORDER BY {PAGE_ORDERS[order]} LIMIT ? OFFSET ?",
+                [*params, page_size, page * page_size],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def position(self, lot_id):
+        """Zero-based position of a lot in insertion (id) order, e.g. to find its page."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM lots WHERE id < ?", (lot_id,)).fetchone()[0]
+
+    def origins(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT origin FROM lots WHERE origin != '' ORDER BY origin"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_frames(self, chunk_size=100_000, query=None, origin=None):
+        """Streams the (filtered) catalog as DataFrames, e.g. for price_lots."""
+        where, params = self._where(query, origin)
+        last_id = 0
+        while True:
+            id_clause = f"{where} AND id > ?" if where else "WHERE id > ?"
+            with self._lock:
+                frame = pd.read_sql_query(
+                    f"SELECT {', '.join(STORE_COLUMNS)} FROM lots {id_clause} ORDER BY id LIMIT ?",
+                    self._conn,
+                    params=[*params, last_id, chunk_size],
+                )
+            if frame.empty:
+                return
+            last_id = int(frame["id"].iloc[-1])
+            yield frame.set_index("id")
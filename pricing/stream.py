@@ -0,0 +1,388 @@
+"""
+Streaming repricing from an append-only green-coffee price feed.
+
+    python -m pricing.stream prices.jsonl --db lots.db -o changes.jsonl
+    python -m pricing.stream prices.jsonl --catalog lots.csv
+
+Each feed line is a JSON object naming a lot (`id` for the SQLite store,
+`name` for a CSV / Parquet catalog) and the fields that moved, usually
+`purchase_price`; an optional `ts` (epoch seconds) is used to measure
+end-to-end lag. The feed is tailed like `tail -f`; every poll coalesces
+the new updates per lot, reprices only those lots with `price_arrays`
+and writes a change-log line for each lot whose 10-yen retail or
+wholesale price actually changed.
+
+A `queue.Queue` of update dicts can be used instead of a file (put `None`
+to stop), see `iter_queue_batches`.
+
+Lines that are not valid JSON objects, or whose fields are not finite,
+non-negative numbers (whole numbers within the form's 10-80 % range for
+the target rates), are skipped and counted (`stats()["rejected"]`); they
+never reach the store or the price columns.
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .engine import (
+    DEFAULT_PLATFORM_FEE_RATE,
+    DEFAULT_SALES_UNIT_G,
+    LOSS_RATE,
+    LOT_COLUMNS,
+    active_mask,
+    price_arrays,
+    to_lot_frame,
+)
+from .store import TARGET_RATE_MAX, TARGET_RATE_MIN
+
+FEED_FIELDS = LOT_COLUMNS[1:]  # fields a feed line may update
+INTEGER_FIELDS = {"purchase_price", "target_rate_retail", "target_rate_wholesale"}
+MAX_FEED_VALUE = 2**31 - 1  # the store and the columnar layout hold 32-bit yen
+FIELD_RANGES = {  # (min, max) accepted per field; the rates match the form sliders
+    "target_rate_retail": (TARGET_RATE_MIN, TARGET_RATE_MAX),
+    "target_rate_wholesale": (TARGET_RATE_MIN, TARGET_RATE_MAX),
+}
+MALFORMED = "_malformed"  # marks a feed line that is not a JSON object
+DEFAULT_POLL_INTERVAL = 0.05
+LAG_BUDGET_S = 1.0
+
+
+def iter_feed_batches(path, poll_interval=DEFAULT_POLL_INTERVAL, from_start=False, follow=True):
+    """
+    Tails a JSONL feed and yields the lists of records appended since the
+    last poll (an empty list when nothing arrived). A truncated or replaced
+    file is read again from the top. With `follow=False` the generator
+    stops at the current end of file.
+    """
+    handle = None
+    inode = None
+    buffer = b""
+    while True:
+        if handle is None:
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                if not follow:
+                    return
+                time.sleep(poll_interval)
+                continue
+            inode = os.fstat(handle.fileno()).st_ino
+            if not from_start:
+                handle.seek(0, os.SEEK_END)
+            from_start = True  # a rotated file is always read from the top
+            buffer = b""
+
+        chunk = handle.read()
+        if chunk:
+            buffer += chunk
+            lines = buffer.split(b"\n")
+            buffer = lines.pop()  # incomplete last line, if any
+            received_at = time.time()
+            records = []
+            for line in lines:
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    if not isinstance(record, dict):
+                        record = {MALFORMED: True}
+                    record.setdefault("_received_at", received_at)
+                    records.append(record)
+            yield records
+            continue
+
+        if not follow:
+            return
+        try:
+            stat = os.stat(path)
+            rotated = stat.st_ino != inode or stat.st_size < handle.tell()
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            handle.close()
+            handle = None
+            continue
+        yield []
+        time.sleep(poll_interval)
+
+
+def iter_queue_batches(source, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Drains a `queue.Queue` of update dicts in batches; `None` ends the stream."""
+    while True:
+        try:
+            first = source.get(timeout=poll_interval)
+        except queue.Empty:
+            yield []
+            continue
+        records = []
+        item = first
+        while True:
+            if item is None:
+                if records:
+                    yield records
+                return
+            item.setdefault("_received_at", time.time())
+            records.append(item)
+            try:
+                item = source.get_nowait()
+            except queue.Empty:
+                break
+        yield records
+
+
+def _number(value, integer=False, low=0, high=MAX_FEED_VALUE):
+    """A finite number within [low, high] (an int for integer fields), or None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if isinstance(value, int):
+        value_ok = low <= value <= high
+    else:
+        value_ok = math.isfinite(value) and low <= value <= high
+    if not value_ok:
+        return None
+    if integer:
+        return int(value) if float(value).is_integer() else None
+    return float(value)
+
+
+def clean_record(record):
+    """
+    The record with its FEED_FIELDS (and `ts`) coerced to numbers, or None
+    if it is malformed or any of those fields is not a usable number.
+    """
+    if not isinstance(record, dict) or record.get(MALFORMED):
+        return None
+    cleaned = dict(record)
+    for field in FEED_FIELDS:
+        if field in record:
+            low, high = FIELD_RANGES.get(field, (0, MAX_FEED_VALUE))
+            value = _number(record[field], field in INTEGER_FIELDS, low, high)
+            if value is None:
+                return None
+            cleaned[field] = value
+    if "ts" in record and _number(record["ts"]) is None:
+        del cleaned["ts"]
+    return cleaned
+
+
+def _native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class StreamRepricer:
+    """
+    Holds the catalog as column arrays plus the current 10-yen prices, and
+    reprices only the lots touched by each feed batch.
+
+    `lots` is a lot frame whose index is the key used by the feed (store
+    ids, or lot names for a plain catalog).
+    """
+
+    def __init__(
+        self,
+        lots,
+        sales_unit_g=DEFAULT_SALES_UNIT_G,
+        fee_rate=DEFAULT_PLATFORM_FEE_RATE,
+        loss_rate=LOSS_RATE,
+        key="id",
+    ):
+        lots = to_lot_frame(lots)
+        if not lots.index.is_unique:
+            raise ValueError(f"duplicate lot {key} in catalog")
+        self.key = key
+        self.sales_unit_g = sales_unit_g
+        self.fee_rate = fee_rate
+        self.loss_rate = loss_rate
+        self.index = lots.index
+        self.names = lots["name"].fillna("").astype(str).to_numpy()
+        self.columns = {
+            # A missing price (NaN from a catalog file) is inactive, like 0
+            "purchase_price": lots["purchase_price"].fillna(0).to_numpy(dtype=np.int64).copy(),
+            "purchase_weight_kg": lots["purchase_weight_kg"].to_numpy(dtype=np.float64).copy(),
+            "target_rate_retail": lots["target_rate_retail"].to_numpy(dtype=np.float64).copy(),
+            "target_rate_wholesale": lots["target_rate_wholesale"].to_numpy(dtype=np.float64).copy(),
+        }
+        self.retail_price, self.wholesale_price = self._price(np.arange(len(self.index)))
+        self.updates = 0
+        self.unknown = 0
+        self.rejected = 0
+        self.changes = 0
+        self._lag_s = deque(maxlen=10_000)
+
+    def validate(self, records):
+        """Cleaned records (see `clean_record`); bad ones are dropped and counted."""
+        cleaned = [clean_record(r) for r in records]
+        valid = [r for r in cleaned if r is not None]
+        self.rejected += len(cleaned) - len(valid)
+        return valid
+
+    def _price(self, positions):
+        cols = {c: v[positions] for c, v in self.columns.items()}
+        priced = price_arrays(
+            cols["purchase_price"], cols["purchase_weight_kg"],
+            cols["target_rate_retail"], cols["target_rate_wholesale"],
+            sales_unit_g=self.sales_unit_g, fee_rate=self.fee_rate, loss_rate=self.loss_rate,
+        )
+        ok = priced["valid"] & active_mask({"name": self.names[positions], **cols})
+        return (
+            np.where(ok, priced["retail_price"], 0),
+            np.where(ok, priced["wholesale_price"], 0),
+        )
+
+    def apply(self, records):
+        """
+        Applies a batch of feed records and returns the change-log entries
+        (dicts) for lots whose retail or wholesale price changed.
+        """
+        records = self.validate(records)
+        if not records:
+            return []
+        positions = self.index.get_indexer([r.get(self.key) for r in records])
+        self.updates += len(records)
+        self.unknown += int((positions < 0).sum())
+
+        # Coalesce: later records win, per field
+        latest = {}
+        for pos, record in zip(positions, records):
+            if pos < 0:
+                continue
+            for field in FEED_FIELDS:
+                if field in record:
+                    self.columns[field][pos] = record[field]
+            latest[pos] = record
+        if not latest:
+            return []
+
+        touched = np.fromiter(latest, dtype=np.int64, count=len(latest))
+        retail, wholesale = self._price(touched)
+        changed = (retail != self.retail_price[touched]) | (wholesale != self.wholesale_price[touched])
+
+        now = time.time()
+        entries = []
+        for i in np.flatnonzero(changed):
+            pos = touched[i]
+            record = latest[pos]
+            sent_at = record.get("ts", record.get("_received_at", now))
+            self._lag_s.append(now - sent_at)
+            entries.append({
+                self.key: _native(self.index[pos]),
+                "name": self.names[pos],
+                "purchase_price": int(self.columns["purchase_price"][pos]),
+                "retail_price_before": int(self.retail_price[pos]),
+                "retail_price": int(retail[i]),
+                "wholesale_price_before": int(self.wholesale_price[pos]),
+                "wholesale_price": int(wholesale[i]),
+                "ts": sent_at,
+                "emitted_at": now,
+            })
+        self.retail_price[touched] = retail
+        self.wholesale_price[touched] = wholesale
+        self.changes += len(entries)
+        return entries
+
+    def stats(self):
+        lag = np.asarray(self._lag_s)
+        return {
+            "updates": self.updates,
+            "unknown": self.unknown,
+            "rejected": self.rejected,
+            "changes": self.changes,
+            "lag_p50_s": float(np.percentile(lag, 50)) if len(lag) else None,
+            "lag_p99_s": float(np.percentile(lag, 99)) if len(lag) else None,
+        }
+
+
+def run(batches, repricer, emit, store=None, on_batch=None):
+    """
+    Feeds `batches` (from `iter_feed_batches` / `iter_queue_batches`) into
+    `repricer`, passing every change-log entry to `emit`. With a LotStore
+    the updated fields are written back in one transaction per batch.
+    Records are validated first, so bad lines reach neither.
+    """
+    for records in batches:
+        records = repricer.validate(records)
+        if records:
+            if store is not None:
+                updates = {}
+                for record in records:
+                    fields = {f: record[f] for f in FEED_FIELDS if f in record}
+                    if fields and record.get("id") is not None:
+                        updates.setdefault(record["id"], {}).update(fields)
+                store.update_many(updates)
+            for entry in repricer.apply(records):
+                emit(entry)
+        if on_batch is not None:
+            on_batch(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pricing.stream", description="仕入れ価格フィードからの逐次再計算")
+    parser.add_argument("feed", help="価格フィード (JSONL, 追記のみ)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", help="ロットの SQLite データベース (フィードは id で指定)")
+    source.add_argument("--catalog", help="ロットの CSV / Parquet (フィードは name で指定)")
+    parser.add_argument("-o", "--output", help="変更ログの出力先 (JSONL, デフォルト: 標準出力)")
+    parser.add_argument("--apply", action="store_true", help="更新された値 (仕入れ価格・重量・目標原価率) をデータベースに書き戻す")
+    parser.add_argument("--from-start", action="store_true", help="フィードを先頭から読む (デフォルト: 末尾から)")
+    parser.add_argument("--once", action="store_true", help="フィードを先頭から末尾まで処理したら終了する (--from-start を含む)")
+    parser.add_argument("--sales-unit-g", type=int, default=DEFAULT_SALES_UNIT_G)
+    parser.add_argument("--fee-rate", type=float, default=DEFAULT_PLATFORM_FEE_RATE)
+    parser.add_argument("--loss-rate", type=float, default=LOSS_RATE)
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    store = None
+    if args.catalog:
+        from .batch import iter_lot_chunks
+
+        lots = pd.concat(list(iter_lot_chunks(args.catalog)), ignore_index=True).set_index("name", drop=False)
+        key = "name"
+    else:
+        from .store import DEFAULT_DB_PATH, LotStore
+
+        store = LotStore(args.db or DEFAULT_DB_PATH)
+        lots = pd.concat(list(store.iter_frames()) or [pd.DataFrame(columns=LOT_COLUMNS)])
+        key = "id"
+        if not args.apply:
+            store = None
+
+    repricer = StreamRepricer(lots, args.sales_unit_g, args.fee_rate, args.loss_rate, key=key)
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    print(f"watching {args.feed} ({len(lots):,} lots)", file=sys.stderr)
+
+    def emit(entry):
+        out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def flush(records):
+        if records:
+            out.flush()
+            stats = repricer.stats()
+            if stats["lag_p99_s"] is not None and stats["lag_p99_s"] > LAG_BUDGET_S:
+                print(f"lag over budget: p99 {stats['lag_p99_s']:.2f} s", file=sys.stderr)
+
+    try:
+        run(
+            iter_feed_batches(args.feed, args.poll_interval, args.from_start or args.once, follow=not args.once),
+            repricer, emit, store=store, on_batch=flush,
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        print(json.dumps(repricer.stats()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
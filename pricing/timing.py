@@ -0,0 +1,203 @@
+"""
+Startup / rerun latency tracking for app.py.
+
+Module state lives for the whole server process (Streamlit re-executes
+app.py on every rerun, but imported modules stay loaded), so cold-start
+figures and import costs are measured once and shared by all sessions.
+
+Per-stage profiling of `main()` is opt-in (COFFEE_PROFILE=1 or the debug
+panel toggle). Every profiled rerun is logged as one JSON record on the
+"coffee.profile" logger, optionally appended to COFFEE_PROFILE_LOG (JSON
+lines), and the running totals are written to COFFEE_PROFILE_PROM in the
+Prometheus text format (e.g. for node_exporter's textfile collector).
+"""
+
+import importlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger("coffee.latency")
+profile_logger = logging.getLogger("coffee.profile")
+
+PROCESS_START = time.perf_counter()  # first import of the pricing package
+
+# Latency budget for the container deployment
+COLD_START_BUDGET_S = 5.0   # start of the first script run -> its finished render
+RERUN_BUDGET_MS = 300.0     # one widget interaction -> finished render
+
+PROFILE_ENABLED = os.environ.get("COFFEE_PROFILE", "") not in ("", "0")
+PROFILE_LOG_PATH = os.environ.get("COFFEE_PROFILE_LOG")    # JSON lines, one record per rerun
+PROFILE_PROM_PATH = os.environ.get("COFFEE_PROFILE_PROM")  # Prometheus text, rewritten per rerun
+
+_import_times = {}
+_rerun_ms = deque(maxlen=200)
+_cold_start_s = None
+
+_stage_ms = defaultdict(lambda: deque(maxlen=200))
+_stage_totals = defaultdict(lambda: [0, 0.0])  # stage -> [count, seconds]
+_counter_totals = defaultdict(int)
+_profiled_reruns = 0
+
+
+def process_uptime():
+    """Seconds since the OS started this process (Linux), else None."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def lazy_import(name):
+    """Imports a module on first use and records how long the import took."""
+    if name not in _import_times:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _import_times[name] = time.perf_counter() - start
+        return module
+    return importlib.import_module(name)
+
+
+def import_times():
+    return dict(_import_times)
+
+
+def record_rerun(started_at):
+    """Records one finished script run that started at `started_at` (perf_counter)."""
+    global _cold_start_s
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    _rerun_ms.append(elapsed_ms)
+
+    if _cold_start_s is None:
+        # Measured from the first script run, not process start: the server may
+        # sit idle for hours before the first browser connects
+        _cold_start_s = elapsed_ms / 1000
+        logger.info("time to first render: %.2f s (budget %.1f s)", _cold_start_s, COLD_START_BUDGET_S)
+        if _cold_start_s > COLD_START_BUDGET_S:
+            logger.warning("cold start over budget: %.2f s > %.1f s", _cold_start_s, COLD_START_BUDGET_S)
+    elif elapsed_ms > RERUN_BUDGET_MS:
+        logger.warning("rerun over budget: %.0f ms > %.0f ms", elapsed_ms, RERUN_BUDGET_MS)
+    return elapsed_ms
+
+
+def latency_summary():
+    """Cold start, last / median / p95 rerun times, import costs and process uptime."""
+    runs = sorted(_rerun_ms)
+    uptime = process_uptime()
+    pick = lambda q: runs[min(len(runs) - 1, int(q * len(runs)))] if runs else None
+    return {
+        "cold_start_s": _cold_start_s,
+        "process_uptime_s": uptime if uptime is not None else time.perf_counter() - PROCESS_START,
+        "last_rerun_ms": _rerun_ms[-1] if _rerun_ms else None,
+        "p50_rerun_ms": pick(0.50),
+        "p95_rerun_ms": pick(0.95),
+        "reruns": len(runs),
+        "imports_s": import_times(),
+        "cold_start_budget_s": COLD_START_BUDGET_S,
+        "rerun_budget_ms": RERUN_BUDGET_MS,
+    }
+
+
+class RerunProfile:
+    """
+    Stage timer for one run of `main()`.
+
+    `lap(stage)` closes the stage that started at the previous lap (or at
+    `started_at`), `count(name, n)` adds to a per-run counter such as the
+    number of beans processed, and `finish()` records the run. All methods
+    are no-ops when `enabled` is False.
+    """
+
+    def __init__(self, started_at, enabled=PROFILE_ENABLED):
+        self.enabled = enabled
+        self._last = started_at
+        self.stages = {}
+        self.counters = {}
+
+    def lap(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def count(self, name, n):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def finish(self):
+        """Aggregates and exports this run; returns its record (or None when disabled)."""
+        global _profiled_reruns
+        if not self.enabled:
+            return None
+        _profiled_reruns += 1
+        for stage, ms in self.stages.items():
+            _stage_ms[stage].append(ms)
+            _stage_totals[stage][0] += 1
+            _stage_totals[stage][1] += ms / 1000
+        for name, n in self.counters.items():
+            _counter_totals[name] += n
+
+        record = {
+            "ts": time.time(),
+            "pid": os.getpid(),
+            "total_ms": sum(self.stages.values()),
+            "stages_ms": self.stages,
+            "counters": self.counters,
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        profile_logger.info(line)
+        try:
+            if PROFILE_LOG_PATH:
+                with open(PROFILE_LOG_PATH, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            if PROFILE_PROM_PATH:
+                tmp = f"{PROFILE_PROM_PATH}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(prometheus_text())
+                os.replace(tmp, PROFILE_PROM_PATH)
+        except OSError as exc:
+            profile_logger.warning("profile export failed: %s", exc)
+        return record
+
+
+def profile_summary():
+    """Per-stage last / median / p95 (ms) and counter totals for the debug panel."""
+    stages = {}
+    for stage, values in _stage_ms.items():
+        runs = sorted(values)
+        stages[stage] = {
+            "last_ms": values[-1],
+            "p50_ms": runs[int(0.50 * (len(runs) - 1))],
+            "p95_ms": runs[int(0.95 * (len(runs) - 1))],
+            "runs": len(runs),
+        }
+    return {"reruns": _profiled_reruns, "stages": stages, "counters": dict(_counter_totals)}
+
+
+def prometheus_text():
+    """Running totals in the Prometheus text exposition format."""
+    lines = [
+        "# HELP coffee_stage_seconds Time spent in each stage of app.py main().",
+        "# TYPE coffee_stage_seconds summary",
+    ]
+    for stage, (count, seconds) in sorted(_stage_totals.items()):
+        lines.append(f'coffee_stage_seconds_sum{{stage="{stage}"}} {seconds:.6f}')
+        lines.append(f'coffee_stage_seconds_count{{stage="{stage}"}} {count}')
+    lines += [
+        "# HELP coffee_profiled_reruns_total Profiled runs of app.py main().",
+        "# TYPE coffee_profiled_reruns_total counter",
+        f"coffee_profiled_reruns_total {_profiled_reruns}",
+    ]
+    for name, n in sorted(_counter_totals.items()):
+        lines += [
+            f"# TYPE coffee_{name}_total counter",
+            f"coffee_{name}_total {n}",
+        ]
+    return "\n".join(lines) + "\n"
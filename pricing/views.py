@@ -0,0 +1,118 @@
+"""
+HTML / table formatting for the results views.
+
+Kept free of Streamlit so the rendering cost can be measured (and reused)
+outside of a running app.
+"""
+
+import html
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RESULTS_PAGE_SIZE = 20
+
+# Numeric result columns that can be sorted / filtered server-side
+NUMERIC_COLUMNS = {
+    "retail_price": "推奨売価(小売)",
+    "wholesale_price": "推奨売価(卸売)",
+    "profit": "利益",
+    "cost_per_bag": "原価/袋",
+    "units": "販売数(袋)",
+    "breakeven_units": "損益分岐点(販売数)",
+}
+
+
+DISPLAY_COLUMNS = ["name", "retail_price", "wholesale_price", "profit", "cost_per_bag", "units", "breakeven_units"]
+
+
+def _column_lists(results, columns=DISPLAY_COLUMNS):
+    """Plain Python lists per column from result dicts, a DataFrame or a ResultColumns table."""
+    if isinstance(results, list):
+        return [[r[col] for r in results] for col in columns]
+    return [results[col].tolist() for col in columns]
+
+
+def _card(name, retail_price, wholesale_price, profit, cost_per_bag, units, breakeven_units):
+    be_color = '#ef4444' if breakeven_units > units else '#22c55e'
+    # Names come from CSV imports and the shared store: never render them as markup
+    name = html.escape(str(name))
+
+    return (
+        f'<div class="bean-card">'
+        f'<div class="bean-card-header"><span>☕ {name}</span></div>'
+        f'<div class="price-tag">'
+        f'<div class="price-label">推奨販売価格 (通常小売)</div>'
+        f'<div class="price-value">¥ {retail_price:,}</div>'
+        f'</div>'
+        f'<div class="grid-info">'
+        f'<div><span class="info-item-label">卸売価格</span></div>'
+        f'<div style="text-align:right"><span class="info-item-value">¥ {wholesale_price:,}</span></div>'
+        f'<div><span class="info-item-label">利益</span></div>'
+        f'<div style="text-align:right"><span class="info-item-value">¥ {profit:,}</span></div>'
+        f'<div><span class="info-item-label">原価/袋</span></div>'
+        f'<div style="text-align:right"><span class="info-item-value">¥ {cost_per_bag:,}</span></div>'
+        f'<div><span class="info-item-label">販売可能数</span></div>'
+        f'<div style="text-align:right"><span class="info-item-value">{units:,} 袋</span></div>'
+        f'</div>'
+        f'<div class="divider"></div>'
+        f'<div style="display:flex; justify-content:space-between; font-size:0.8rem; color:#64748b;">'
+        f'<span>損益分岐点 (販売数)</span>'
+        f'<span style="font-weight:600; color:{be_color}">{breakeven_units} 袋</span>'
+        f'</div>'
+        f'</div>'
+    )
+
+
+def card_html(r):
+    """One result card (カード表示) as an HTML string."""
+    return _card(
+        r["name"], r["retail_price"], r["wholesale_price"], r["profit"],
+        r["cost_per_bag"], r["units"], r["breakeven_units"],
+    )
+
+
+def table_frame(results):
+    """The 一覧表 rows, formatted for display."""
+    names, retail, wholesale, profit, cost, units, breakeven = _column_lists(results)
+    return pd.DataFrame({
+        "豆の名称": names,
+        "推奨売価(小売)": [f"{v:,} 円" for v in retail],
+        "推奨売価(卸売)": [f"{v:,} 円" for v in wholesale],
+        "利益": [f"{v:,} 円" for v in profit],
+        "原価/袋": [f"{v:,} 円" for v in cost],
+        "販売数(袋)": [f"{v:,}" for v in units],
+        "損益分岐点(販売数)": [f"{v} 袋" for v in breakeven],
+    })
+
+
+def cards_html(results):
+    """All cards of a page joined into a single markdown payload."""
+    return "".join(_card(*values) for values in zip(*_column_lists(results)))
+
+
+def select_page(results, sort_by=None, ascending=True, filters=None, page=0, page_size=DEFAULT_RESULTS_PAGE_SIZE):
+    """
+    Filters, sorts and slices priced results (a DataFrame or a
+    ResultColumns table) without formatting them.
+
+    `filters` maps a numeric column to a `(min, max)` range (either bound
+    may be None). Returns `(page_frame, matching_rows)`; only the returned
+    page needs to be formatted and sent to the browser.
+    """
+    mask = np.ones(len(results), dtype=bool)
+    for col, (low, high) in (filters or {}).items():
+        values = np.asarray(results[col])
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    positions = np.flatnonzero(mask)
+
+    if sort_by is not None and len(positions):
+        keys = np.asarray(results[sort_by])[positions]
+        order = np.argsort(keys if ascending else -keys, kind="stable")
+        positions = positions[order]
+
+    start = page * page_size
+    return results.take(positions[start:start + page_size]), len(positions)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from pricing import bag_metrics, discount_curve, discount_grid
+
+
+def test_discount_curve_returns_independent_frames():
+    first = discount_curve(1000, 300, 100, 0.1, 200)
+    first.loc[0, "Profit (JPY)"] = -1
+    assert discount_curve(1000, 300, 100, 0.1, 200).loc[0, "Profit (JPY)"] != -1
+
+
+def test_discount_curve_matches_bag_metrics():
+    curve = discount_curve(1000, 300, 100, 0.1, 300)
+    profit = [int(bag_metrics(1000, 300, 100, 300, d, 0.1)["profit"]) for d in range(0, 51, 5)]
+    assert curve["Discount (%)"].tolist() == list(range(0, 51, 5))
+    assert curve["Profit (JPY)"].tolist() == profit
+
+
+def test_discount_grid_is_read_only():
+    grid = discount_grid(1000, 300, 100, 0.1)
+    assert grid is discount_grid(1000, 300, 100, 0.1)
+    with pytest.raises(ValueError):
+        grid["profit"][0, 0] = np.nan
@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pricing import LotColumns, price_columns, price_lots, summarize
+from pricing.bench import make_catalog
+from pricing.engine import LOSS_RATE, RESULT_COLUMNS
+
+
+def scalar_loop(beans, sales_unit_g, fee_rate, loss_rate=LOSS_RATE):
+    """The original per-bean loop from app.py, kept as the reference."""
+    results = []
+    total_purchase = 0
+    total_profit = 0
+    for bean in beans:
+        if not (bean["name"] and bean["purchase_price"] > 0 and bean["purchase_weight_kg"] > 0):
+            continue
+        roasted_weight_g = bean["purchase_weight_kg"] * 1000 * (1 - loss_rate)
+        sellable_units = math.floor(roasted_weight_g / sales_unit_g)
+        if sellable_units <= 0:
+            continue
+
+        cost_per_bag = bean["purchase_price"] / sellable_units
+        price_retail = math.ceil(cost_per_bag / (bean["target_rate_retail"] / 100) / 10) * 10
+        price_wholesale = math.ceil(cost_per_bag / (bean["target_rate_wholesale"] / 100) / 10) * 10
+
+        revenue_per_bag = price_retail * (1 - fee_rate)
+        if revenue_per_bag > 0:
+            breakeven_units = math.ceil(bean["purchase_price"] / revenue_per_bag)
+        else:
+            breakeven_units = 999999
+
+        expected_profit = (price_retail * sellable_units * (1 - fee_rate)) - bean["purchase_price"]
+        results.append({
+            "name": bean["name"],
+            "retail_price": int(price_retail),
+            "wholesale_price": int(price_wholesale),
+            "profit": int(expected_profit),
+            "cost_per_bag": int(cost_per_bag),
+            "units": int(sellable_units),
+            "breakeven_units": int(breakeven_units),
+        })
+        total_purchase += bean["purchase_price"]
+        total_profit += expected_profit
+    return results, total_purchase, total_profit
+
+
+def catalog(n, seed):
+    lots = make_catalog(n, seed=seed).astype({"target_rate_retail": float})
+    rng = np.random.default_rng(seed + 1)
+    # Fractional cost rates, lots too small to yield a bag and inactive rows
+    lots.loc[rng.choice(n, n // 10, replace=False), "target_rate_retail"] = 33.33
+    lots.loc[rng.choice(n, n // 20, replace=False), "purchase_weight_kg"] = 0.05
+    lots.loc[rng.choice(n, n // 20, replace=False), "purchase_price"] = 0
+    lots.loc[rng.choice(n, n // 20, replace=False), "name"] = ""
+    return lots
+
+
+PARAMS = [
+    (100, 0.10, LOSS_RATE),
+    (200, 0.0, LOSS_RATE),
+    (150, 0.35, 0.15),
+    (30, 1.0, 0.25),
+]
+
+
+@pytest.mark.parametrize("sales_unit_g, fee_rate, loss_rate", PARAMS)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_price_lots_matches_scalar_loop(seed, sales_unit_g, fee_rate, loss_rate):
+    lots = catalog(2_000, seed)
+    expected, total_purchase, total_profit = scalar_loop(lots.to_dict("records"), sales_unit_g, fee_rate, loss_rate)
+
+    priced = price_lots(lots, sales_unit_g, fee_rate, loss_rate)
+    assert priced[RESULT_COLUMNS].to_dict("records") == expected
+    assert summarize(priced)[:2] == (total_purchase, total_profit)
+
+
+@pytest.mark.parametrize("sales_unit_g, fee_rate, loss_rate", PARAMS)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_price_columns_matches_scalar_loop(seed, sales_unit_g, fee_rate, loss_rate):
+    lots = catalog(2_000, seed)
+    expected, _, _ = scalar_loop(lots.to_dict("records"), sales_unit_g, fee_rate, loss_rate)
+
+    priced = price_columns(LotColumns.from_frame(lots), sales_unit_g, fee_rate, loss_rate).to_frame()
+    assert priced[RESULT_COLUMNS].astype({col: int for col in RESULT_COLUMNS[1:]}).to_dict("records") == expected
+
+
+def test_price_lots_keeps_input_index():
+    lots = pd.DataFrame(
+        [
+            {"name": "A", "purchase_price": 3000, "purchase_weight_kg": 1.0, "target_rate_retail": 30, "target_rate_wholesale": 50},
+            {"name": "", "purchase_price": 3000, "purchase_weight_kg": 1.0, "target_rate_retail": 30, "target_rate_wholesale": 50},
+            {"name": "C", "purchase_price": 3000, "purchase_weight_kg": 0.1, "target_rate_retail": 30, "target_rate_wholesale": 50},
+            {"name": "D", "purchase_price": 5000, "purchase_weight_kg": 2.0, "target_rate_retail": 40, "target_rate_wholesale": 60},
+        ],
+        index=[10, 11, 12, 13],
+    )
+    priced = price_lots(lots, sales_unit_g=100)
+    assert priced.index.tolist() == [10, 13]
+    assert price_columns(LotColumns.from_frame(lots), sales_unit_g=100).index.tolist() == [10, 13]
+
+
+def test_summarize_keeps_fractional_purchase_prices():
+    lots = pd.DataFrame({
+        "name": ["A", "B"],
+        "purchase_price": [3000, 1500.5],
+        "purchase_weight_kg": [1.0, 1.0],
+        "target_rate_retail": [30, 30],
+        "target_rate_wholesale": [50, 50],
+    })
+    _, total_purchase, total_profit = scalar_loop(lots.to_dict("records"), 100, 0.1)
+    assert summarize(price_lots(lots))[:2] == (4500.5, total_profit) == (total_purchase, total_profit)
@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pricing import inventory, project
+from pricing.engine import LOSS_RATE
+
+
+def fifo_reference(weight_kg, demand, batch_kg, interval, shelf_life, reorder, sales_unit_g=100, loss_rate=LOSS_RATE):
+    """Bag-by-bag FIFO shelf for one bean and one demand path: (sold, written_off, lost, stockout_days)."""
+    green_left = round(weight_kg * 1000)
+    batch_g = round(batch_kg * 1000)
+    stock = []  # [roast day, bags left], oldest first
+    sold = written_off = lost = stockout_days = 0
+    for day, wanted in enumerate(demand.tolist()):
+        while stock and stock[0][0] <= day - shelf_life:
+            written_off += stock.pop(0)[1]
+        if day % interval == 0:
+            while sum(bags for _, bags in stock) < reorder and green_left > 0:
+                green = min(batch_g, green_left)
+                green_left -= green
+                stock.append([day, math.floor(green * (1 - loss_rate) / sales_unit_g)])
+        if wanted > sum(bags for _, bags in stock):
+            stockout_days += 1
+        left = wanted
+        while left and stock:
+            take = min(left, stock[0][1])
+            stock[0][1] -= take
+            left -= take
+            if stock[0][1] == 0:
+                stock.pop(0)
+        sold += wanted - left
+        lost += left
+    return sold, written_off, lost, stockout_days
+
+
+@pytest.fixture
+def fixed_demand(monkeypatch):
+    """Replaces the Poisson draws with a given (cells, days) demand array."""
+    def install(demand):
+        def sampler(rng, lam):
+            assert lam.size == len(demand)
+            days = iter(demand.T)
+            return lambda: next(days)
+        monkeypatch.setattr(inventory, "_poisson_sampler", sampler)
+    return install
+
+
+LOTS = pd.DataFrame({
+    "name": ["A", "B", "C", "D"],
+    "purchase_price": [20000, 5000, 60000, 9000],
+    "purchase_weight_kg": [20.0, 1.2, 30.0, 8.0],
+    "target_rate_retail": [30, 40, 25, 35],
+    "target_rate_wholesale": [50, 60, 45, 55],
+})
+
+
+@pytest.mark.parametrize("days, batch_kg, interval, shelf_life", [
+    (120, 1.0, 7, 10),
+    (90, 3.0, 5, 30),
+    (200, 0.7, 3, 4),
+    (60, 2.0, 7, 200),
+])
+def test_project_matches_fifo_reference(fixed_demand, days, batch_kg, interval, shelf_life):
+    daily_demand = np.array([2.0, 0.5, 4.0, 1.5])
+    n_scenarios = 3
+    rng = np.random.default_rng(days)
+    demand = rng.poisson(np.repeat(daily_demand, n_scenarios)[:, None] * 0.6, (len(LOTS) * n_scenarios, days)).astype(np.uint8)
+    fixed_demand(demand)
+
+    summary, _ = project(
+        LOTS, daily_demand=daily_demand, days=days, roast_batch_kg=batch_kg, roast_interval_days=interval,
+        shelf_life_days=shelf_life, n_scenarios=n_scenarios, demand_factor=1.0,
+    )
+
+    for i, lot in enumerate(LOTS.itertuples()):
+        reorder = math.ceil(daily_demand[i] * interval)
+        ref = np.array([
+            fifo_reference(lot.purchase_weight_kg, demand[i * n_scenarios + s], batch_kg, interval, shelf_life, reorder)
+            for s in range(n_scenarios)
+        ])
+        assert summary.iloc[i]["sold_mean"] == ref[:, 0].mean()
+        assert summary.iloc[i]["written_off_mean"] == ref[:, 1].mean()
+        assert summary.iloc[i]["lost_sales_mean"] == ref[:, 2].mean()
+        assert summary.iloc[i]["stockout_days_mean"] == ref[:, 3].mean()
+
+
+def test_poisson_sampler_moments():
+    rng = np.random.default_rng(1)
+    lam = np.repeat([[0.3], [2.0], [9.0]], 20_000, axis=1)
+    draw = inventory._poisson_sampler(rng, lam)
+    draws = np.stack([draw() for _ in range(10)]).reshape(10, 3, -1).astype(np.float64)
+    for row, expected in enumerate([0.3, 2.0, 9.0]):
+        assert draws[:, row].mean() == pytest.approx(expected, rel=0.02)
+        assert draws[:, row].var() == pytest.approx(expected, rel=0.05)
@@ -0,0 +1,19 @@
+import pytest
+
+from pricing import simulate
+from pricing.bench import make_catalog
+from pricing.montecarlo import MAX_SCENARIOS
+
+
+@pytest.mark.parametrize("n_scenarios", [0, MAX_SCENARIOS + 1])
+def test_simulate_caps_scenarios(n_scenarios):
+    with pytest.raises(ValueError):
+        simulate(make_catalog(3), n_scenarios=n_scenarios)
+
+
+def test_simulate_blocks_do_not_depend_on_workers():
+    lots = make_catalog(40)
+    serial = simulate(lots, n_scenarios=500, max_elements=2_000, workers=1)
+    pooled = simulate(lots, n_scenarios=500, max_elements=2_000, workers=2)
+    assert serial.equals(pooled)
+    assert (serial["profit_p5"] <= serial["profit_p95"]).all()
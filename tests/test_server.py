@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from pricing.server import PricingService, create_app
+
+LOT = {"name": "Ethiopia", "purchase_price": 12000, "purchase_weight_kg": 10, "target_rate_retail": 30, "target_rate_wholesale": 50}
+
+
+def request(app, body, method="POST", path="/price", query=b"", content_type=b"application/json"):
+    """Sends one request through the ASGI app; returns (status, decoded JSON body)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": [(b"content-type", content_type)]}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+@pytest.fixture
+def app():
+    return create_app(PricingService(workers=1))
+
+
+def test_prices_lots(app):
+    status, payload = request(app, json.dumps({"lots": [LOT], "sales_unit_g": 100}).encode())
+    assert status == 200
+    assert payload["results"][0]["priced"] is True
+    assert payload["results"][0]["retail_price"] == 500
+
+
+@pytest.mark.parametrize("body", [b'"abc"', b"12", b"null", b"true", b"{", b'{"lots": "abc"}', b"[1, 2]"])
+def test_rejects_malformed_bodies(app, body):
+    status, payload = request(app, body)
+    assert status == 400
+    assert "error" in payload
+    assert app.service.errors == 1
+
+
+@pytest.mark.parametrize("options", [
+    {"fee_rate": "nan"},
+    {"fee_rate": 1},
+    {"fee_rate": -0.1},
+    {"loss_rate": "inf"},
+    {"loss_rate": 1.5},
+    {"sales_unit_g": 0},
+    {"sales_unit_g": 1e400},
+    {"fee_rate": []},
+])
+def test_rejects_bad_parameters(app, options):
+    body = json.dumps({"lots": [LOT], **options}).encode().replace(b"Infinity", b"1e400")
+    status, _ = request(app, body)
+    assert status == 400
+
+
+def test_rejects_bad_query_parameters(app):
+    status, _ = request(app, json.dumps(LOT).encode(), query=b"fee_rate=nan", content_type=b"application/x-ndjson")
+    assert status == 400
+
+
+@pytest.mark.parametrize("field, value", [
+    ("purchase_weight_kg", 1e300),
+    ("purchase_price", 1e300),
+    ("purchase_price", "abc"),
+    ("purchase_price", [1, 2]),
+    ("target_rate_retail", 0),
+    ("target_rate_retail", 1e-300),
+])
+def test_unpriceable_lots_are_not_priced(app, field, value):
+    status, payload = request(app, json.dumps({"lots": [{**LOT, field: value}, LOT]}).encode())
+    assert status == 200
+    bad, good = payload["results"]
+    assert bad == {"priced": False}
+    assert good["priced"] is True
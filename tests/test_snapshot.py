@@ -0,0 +1,18 @@
+import pytest
+
+from pricing import LotColumns, ResultColumns, price_columns
+from pricing.bench import make_catalog
+from pricing.snapshot import load_or_compute, snapshot_key
+
+pytest.importorskip("pyarrow")
+
+
+def test_snapshot_round_trip(tmp_path):
+    results = price_columns(LotColumns.from_frame(make_catalog(500)))
+    key = snapshot_key(("catalog", 1), 100, 0.1, 0.2)
+
+    table, source = load_or_compute(key, lambda: results, ResultColumns, directory=str(tmp_path))
+    assert source == "computed"
+    table, source = load_or_compute(key, lambda: pytest.fail("recomputed"), ResultColumns, directory=str(tmp_path))
+    assert source == "snapshot"
+    assert table.to_frame().equals(results.to_frame())
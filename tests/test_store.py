@@ -0,0 +1,39 @@
+import pandas as pd
+
+from pricing.store import LotStore
+
+
+def test_add_many_skips_rows_the_form_cannot_hold():
+    store = LotStore(":memory:")
+    csv = pd.DataFrame({
+        "name": ["ok", "blank", "text", "fractional", "rate", "negative", "float ok"],
+        "origin": ["", "", "", "", "", "", "Kenya"],
+        "purchase_price": ["3000", "", "abc", "1500.5", "2000", "-1", "4000.0"],
+        "purchase_weight_kg": ["1.5", "1", "1", "1", "1", "1", "2.25"],
+        "target_rate_retail": ["30", "30", "30", "30", "33.5", "30", "35"],
+        "target_rate_wholesale": ["50", "50", "50", "50", "50", "50", "50"],
+    })
+    assert store.add_many(csv) == (2, 5)
+
+    lots = store.page(order="id")
+    assert [lot["name"] for lot in lots] == ["ok", "float ok"]
+    assert lots[1] == {
+        "id": 2, "name": "float ok", "origin": "Kenya", "purchase_price": 4000,
+        "purchase_weight_kg": 2.25, "target_rate_retail": 35, "target_rate_wholesale": 50,
+    }
+    assert isinstance(lots[1]["purchase_price"], int)
+
+
+def test_add_many_fills_missing_columns():
+    store = LotStore(":memory:")
+    assert store.add_many([{"name": "A", "purchase_price": 1000, "purchase_weight_kg": 1.0}]) == (1, 0)
+    lot = store.get(1)
+    assert (lot["origin"], lot["target_rate_retail"], lot["target_rate_wholesale"]) == ("", 30, 50)
+
+
+def test_page_keeps_insertion_order_when_renamed():
+    store = LotStore(":memory:")
+    ids = [store.add(name=name) for name in ["c", "a", "b"]]
+    store.update(ids[0], name="z")
+    assert [lot["id"] for lot in store.page(order="id")] == ids
+    assert store.position(ids[2]) == 2
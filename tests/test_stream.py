@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from pricing.store import LotStore
+from pricing.stream import StreamRepricer, clean_record, iter_feed_batches, main, run
+
+
+@pytest.mark.parametrize("record", [
+    {"id": 1, "target_rate_retail": 33.5},
+    {"id": 1, "target_rate_retail": 5},
+    {"id": 1, "target_rate_wholesale": 90},
+    {"id": 1, "purchase_price": 1500.5},
+    {"id": 1, "purchase_price": -100},
+    {"id": 1, "purchase_price": "1500"},
+    {"id": 1, "purchase_weight_kg": float("nan")},
+    {"id": 1, "purchase_price": True},
+    {"_malformed": True},
+])
+def test_clean_record_rejects(record):
+    assert clean_record(record) is None
+
+
+def test_clean_record_accepts_whole_floats():
+    cleaned = clean_record({"id": 1, "purchase_price": 1500.0, "target_rate_retail": 40.0, "purchase_weight_kg": 2.5})
+    assert cleaned["purchase_price"] == 1500 and isinstance(cleaned["purchase_price"], int)
+    assert cleaned["target_rate_retail"] == 40 and isinstance(cleaned["target_rate_retail"], int)
+    assert cleaned["purchase_weight_kg"] == 2.5
+
+
+@pytest.fixture
+def store():
+    store = LotStore(":memory:")
+    store.add(name="Ethiopia", purchase_price=12000, purchase_weight_kg=1.0, target_rate_retail=30, target_rate_wholesale=50)
+    yield store
+    store.close()
+
+
+def test_run_writes_back_only_valid_records(store):
+    repricer = StreamRepricer(next(store.iter_frames()))
+    entries = []
+    run([[
+        {"id": 1, "target_rate_retail": 33.5},
+        {"id": 1, "target_rate_wholesale": 9},
+        {"id": 1, "purchase_price": 15000},
+    ]], repricer, entries.append, store=store)
+
+    lot = store.get(1)
+    assert lot["purchase_price"] == 15000
+    assert (lot["target_rate_retail"], lot["target_rate_wholesale"]) == (30, 50)
+    assert repricer.stats()["rejected"] == 2
+    assert [e["purchase_price"] for e in entries] == [15000]
+
+
+def test_once_apply_keeps_integer_columns(tmp_path, capsys):
+    db = str(tmp_path / "lots.db")
+    store = LotStore(db)
+    store.add(name="Ethiopia", purchase_price=12000, purchase_weight_kg=1.0)
+    store.close()
+    feed = tmp_path / "prices.jsonl"
+    feed.write_text(
+        '{"id": 1, "target_rate_retail": 33.5}\n'
+        "not json\n"
+        '{"id": 1, "target_rate_retail": 40, "purchase_price": 13000}\n'
+    )
+
+    assert main([str(feed), "--db", db, "--once", "--apply", "-o", str(tmp_path / "changes.jsonl")]) == 0
+    stats = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+    assert stats["rejected"] == 2
+
+    store = LotStore(db)
+    lot = store.get(1)
+    store.close()
+    assert lot["target_rate_retail"] == 40 and isinstance(lot["target_rate_retail"], int)
+    assert lot["purchase_price"] == 13000
+
+
+def test_feed_marks_malformed_lines(tmp_path):
+    feed = tmp_path / "prices.jsonl"
+    feed.write_text('{"id": 1}\n[1, 2]\n{broken\n')
+    records = [r for batch in iter_feed_batches(feed, from_start=True, follow=False) for r in batch]
+    assert [clean_record(r) is None for r in records] == [False, True, True]
@@ -0,0 +1,18 @@
+from pricing.views import card_html, cards_html
+
+RESULT = {
+    "name": "Ethiopia", "retail_price": 1000, "wholesale_price": 600, "profit": 24000,
+    "cost_per_bag": 300, "units": 40, "breakeven_units": 14,
+}
+
+
+def test_card_escapes_name():
+    card = card_html({**RESULT, "name": '<img src=x onerror="alert(1)">&'})
+    assert "<img" not in card
+    assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt;&amp;" in card
+
+
+def test_cards_escape_every_name():
+    cards = cards_html([RESULT, {**RESULT, "name": "<script>"}])
+    assert "☕ Ethiopia" in cards
+    assert "<script>" not in cards and "&lt;script&gt;" in cards